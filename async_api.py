@@ -0,0 +1,139 @@
+import asyncio
+
+import aiohttp
+
+import api
+
+
+class AsyncApiClient:
+    """Coroutine version of api.py. All requests share one aiohttp session
+    whose connection pool keeps connections to the server alive between
+    actions, so many games can be played concurrently from one event loop.
+    """
+
+    def __init__(self, api_key, pool_size=100, keepalive_timeout=60, timeout=30):
+        """
+        :param api_key: string - the api key
+        :param pool_size: int - max number of simultaneous connections
+        :param keepalive_timeout: float - seconds an idle connection is kept open
+        :param timeout: float - max seconds per request
+        """
+        self.api_key: str = api_key
+        self.pool_size: int = pool_size
+        self.keepalive_timeout: float = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session: aiohttp.ClientSession = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def _session(self):
+        if not self.session:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=self.keepalive_timeout
+                ),
+                headers={"x-api-key": self.api_key},
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def _request(self, method, path, action, game_id=None, json=None):
+        """Sends a request and returns the decoded response, None on errors
+
+        :param method: string - the http method
+        :param path: string - the path relative to base_api_path
+        :param action: string - what the request does, used in error messages
+        :param game_id: string - the game id, if any
+        :param json: the request body, if any
+        """
+        if game_id:
+            path += "?GameId=" + game_id
+        try:
+            async with self._session().request(
+                method, api.base_api_path + path, json=json
+            ) as response:
+                if response.status == 200:
+                    return await response.json(content_type=None)
+
+                print("Fatal Error: could not " + action)
+                print(
+                    str(response.status)
+                    + " "
+                    + str(response.reason)
+                    + ": "
+                    + await response.text()
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print("Fatal Error: could not " + action)
+            print("Something went wrong with the request: " + str(e))
+
+    async def new_game(self, game_options=""):
+        return await self._request("POST", "new", "create new game", json=game_options)
+
+    async def start_game(self, game_id=None):
+        return await self._request("GET", "start", "start game", game_id)
+
+    async def end_game(self, game_id=None):
+        await self._request("GET", "end", "end game", game_id)
+
+    async def get_score(self, game_id=None):
+        return await self._request("GET", "score", "get score", game_id)
+
+    async def get_game_info(self, game_id=None):
+        return await self._request("GET", "gameInfo", "get game info", game_id)
+
+    async def place_foundation(self, foundation, game_id=None):
+        return await self._request(
+            "POST",
+            "action/startBuild",
+            "do action place foundation",
+            game_id,
+            foundation,
+        )
+
+    async def build(self, pos, game_id=None):
+        return await self._request(
+            "POST", "action/Build", "do action build", game_id, pos
+        )
+
+    async def maintenance(self, pos, game_id=None):
+        return await self._request(
+            "POST", "action/maintenance", "do action maintenance", game_id, pos
+        )
+
+    async def demolish(self, pos, game_id=None):
+        return await self._request(
+            "POST", "action/demolish", "do action demolish", game_id, pos
+        )
+
+    async def wait(self, game_id=None):
+        return await self._request("POST", "action/wait", "do action wait", game_id)
+
+    async def adjust_energy(self, energy_level, game_id=None):
+        return await self._request(
+            "POST",
+            "action/adjustEnergy",
+            "do action adjust energy level",
+            game_id,
+            energy_level,
+        )
+
+    async def buy_upgrades(self, upgrade, game_id=None):
+        return await self._request(
+            "POST", "action/buyUpgrade", "do action buy upgrades", game_id, upgrade
+        )
+
+    async def get_game_state(self, game_id=None):
+        return await self._request("GET", "gameState", "get game state", game_id)
+
+    async def get_games(self):
+        return await self._request("GET", "games", "get games")
@@ -0,0 +1,129 @@
+import time
+from typing import Tuple
+
+from async_api import AsyncApiClient
+from game_layer import Action, GameLayer, action_request
+from game_state import GameState
+
+
+class AsyncGameLayer(GameLayer):
+    """
+    GameLayer whose game actions are coroutines sent through an AsyncApiClient.
+    Blueprint and effect lookups are inherited unchanged.
+    """
+
+    def __init__(self, client: AsyncApiClient):
+        super().__init__(client.api_key, backend=None)
+        self.client: AsyncApiClient = client
+
+    async def new_game(self, map_name: str = "training0"):
+        """
+        Create a new game.
+        """
+        if map_name:
+            game_options = {"mapName": map_name}
+        else:
+            game_options = ""
+
+        self.game_state = GameState(await self.client.new_game(game_options))
+
+    async def end_game(self):
+        """
+        End the current game
+        """
+        await self.client.end_game(self.game_state.game_id)
+
+    async def start_game(self):
+        """
+        Starts the game.
+        """
+        self.state_values = await self.client.start_game(self.game_state.game_id)
+        self.game_state.update_state(self.state_values)
+
+    async def place_foundation(self, pos: Tuple[int, int], building_name: str):
+        """
+        Places a building with name building_name at the given position.
+        :param pos: (int, int) - the position
+        :param building_name: string - the name of the building
+        """
+        await self._act("place_foundation", pos, building_name)
+
+    async def build(self, pos: Tuple[int, int]):
+        """
+        Continues the construction of a building at the given position.
+        :param pos: (int, int) - the position
+        """
+        await self._act("build", pos)
+
+    async def maintenance(self, pos: Tuple[int, int]):
+        """
+        Performs maintenance on the building at the given position.
+        :param pos: (int, int) - the position
+        """
+        await self._act("maintenance", pos)
+
+    async def demolish(self, pos: Tuple[int, int]):
+        """
+        Demolishes the building at the given position.
+        :param pos: (int, int) - the position
+        """
+        await self._act("demolish", pos)
+
+    async def adjust_energy_level(self, pos: Tuple[int, int], value: float):
+        """
+        Adjusts the requested energy to value on the building at the given position.
+        :param pos: (int, int) - the position
+        :param value: float - the new requested value
+        """
+        await self._act("adjust_energy_level", pos, value)
+
+    async def wait(self):
+        """
+        Advances the game by one turn.
+        """
+        await self._act("wait")
+
+    async def buy_upgrade(self, pos: Tuple[int, int], upgrade: str):
+        """
+        Adds the specified upgrade to the building at the given position.
+        :param pos: (int, int) - the position
+        :param upgrade: string - the upgrade to purchase
+        """
+        await self._act("buy_upgrade", pos, upgrade)
+
+    async def _act(self, action, *args):
+        """Sends an action right away, batches aren't supported"""
+        name, body = action_request(action, *args)
+        prediction = self._before_send(name, body)
+        start = time.perf_counter()
+        state = await getattr(self.client, name)(*body, self.game_state.game_id)
+        self._after_send(state, prediction, time.perf_counter() - start)
+        self.game_state.update_state(state)
+
+    async def get_score(self):
+        """
+        Gets the score for the game.
+        :return An object with partial and total scores.
+        """
+        return await self.client.get_score(self.game_state.game_id)
+
+    async def get_game_info(self, game_id: str):
+        """
+        Gets the game info of an already ongoing game and updates the state.
+        :param game_id: string - the id of the game to get info about.
+        """
+        self.game_state = GameState(await self.client.get_game_info(game_id))
+
+    async def get_game_state(self, game_id: str):
+        """
+        Gets the game state of an already ongoing game and updates the state.
+        :param game_id: string - the id of the game to get the state.
+        """
+        self.game_state.update_state(await self.client.get_game_state(game_id))
+
+    async def perform(self, action: Action):
+        """
+        Performs an action recorded by ActionRecorder.
+        :param action: Action - the action
+        """
+        await getattr(self, action.name)(*action.args)
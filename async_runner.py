@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+
+import main
+from async_api import AsyncApiClient
+from async_game_layer import AsyncGameLayer
+from game_layer import ActionRecorder
+from runner import MAPS, summarize
+
+
+def decide(game_layer):
+    """Runs main.strategy for one game and returns the actions it chose.
+    This is synchronous, so games sharing the event loop can't interleave
+    while main.GAME_LAYER points at this game's recorder.
+    """
+    recorder = ActionRecorder(game_layer)
+    main.GAME_LAYER = recorder
+    main.strategy(game_layer.game_state)
+    return recorder.actions
+
+
+async def play(client, game_map, semaphore):
+    """Plays one game with main.strategy
+
+    Returns:
+        (str, str, int) - The map, game id and final score
+    """
+    async with semaphore:
+        game_layer = AsyncGameLayer(client)
+        await game_layer.new_game(game_map)
+        try:
+            await game_layer.start_game()
+            main.GAME_LAYER = ActionRecorder(game_layer)
+            main.preprocess_map()
+            state = game_layer.game_state
+            while state.turn < state.max_turns:
+                for action in decide(game_layer):
+                    await game_layer.perform(action)
+                state = game_layer.game_state
+            score = await game_layer.get_score()
+            return game_map, state.game_id, score["finalScore"]
+        except Exception:
+            await game_layer.end_game()
+            raise
+
+
+async def run(maps, games, concurrency):
+    """Plays games on every map concurrently from one event loop
+
+    Args:
+        maps ([str]) - The map names
+        games (int) - Number of games per map
+        concurrency (int) - Max number of games in flight
+
+    Returns:
+        {str: [(str, int)]} - (game id, final score) of every finished game per map
+    """
+    results = {x: [] for x in maps}
+    semaphore = asyncio.Semaphore(concurrency)
+    async with AsyncApiClient(main.API_KEY, pool_size=concurrency) as client:
+        for result in await asyncio.gather(
+            *(play(client, x, semaphore) for _ in range(games) for x in maps),
+            return_exceptions=True,
+        ):
+            if isinstance(result, Exception):
+                print("Game failed: " + str(result))
+                continue
+            game_map, game_id, final_score = result
+            results[game_map].append((game_id, final_score))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games from one process")
+    parser.add_argument("maps", nargs="*", default=MAPS)
+    parser.add_argument("-n", "--games", type=int, default=1, help="games per map")
+    parser.add_argument("-c", "--concurrency", type=int, default=24)
+    args = parser.parse_args()
+    summarize(asyncio.run(run(args.maps, args.games, args.concurrency)))
@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import simulator
+from benchmarks.payloads import synthetic_game, turn_payloads
+from constants import FUNDS_MED
+from game_state import GameState
+from logic import (
+    available_map_slots,
+    best_residence_location,
+    best_utility_location,
+    calculate_energy_need,
+    calculate_energy_needs,
+)
+from main import _feasible_residences, _optimal_residence
+from placement import PlacementGrid
+
+# Times the per-turn hot paths on synthetic states of increasing size and
+# compares them to a stored baseline:
+#
+#   python -m benchmarks.hot_paths --save-baseline
+#   python -m benchmarks.hot_paths  # Exits with 1 on a regression
+#   python -m benchmarks.hot_paths -k pending_work --save-baseline
+#
+# Each benchmark is also timed relative to a fixed reference workload, in
+# alternating runs, and the gate compares those ratios. They don't change
+# with the speed or load of the machine, so neither shows up as a
+# regression. Saving a selection with -k merges it into the stored baseline.
+
+BASELINE_PATH = "benchmarks/baseline.json"
+TOLERANCE = 0.25  # Slowdown relative to the baseline reported as a regression
+
+# (map size, residences, utilities)
+CASES = [(10, 20, 5), (20, 80, 20), (40, 300, 75)]
+TURNS = 20  # Payloads update_state cycles through
+
+
+def timeit(function, min_time=0.05, repeat=5):
+    """Best mean time of one call over repeat runs of at least min_time
+
+    Returns:
+        float - Microseconds per call
+    """
+    number = _calls(function, min_time)
+    return 1e6 * min(_mean(function, number) for _ in range(repeat))
+
+
+def relative(function, min_time=0.02, repeat=9):
+    """Median ratio of the mean time of one call to that of reference, over
+    repeat pairs of runs of at least min_time
+
+    Returns:
+        float - Calls of reference per call
+    """
+    number = _calls(function, min_time)
+    reference_number = _calls(reference, min_time)
+    return statistics.median(
+        _mean(function, number) / _mean(reference, reference_number)
+        for _ in range(repeat)
+    )
+
+
+def _calls(function, min_time):
+    """The number of calls taking at least min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_time:
+            return number
+        number *= 2
+
+
+def _mean(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def reference():
+    """Plain Python and NumPy work that no change to the repo affects"""
+    values = {i: (i * 7919) % 1009 for i in range(500)}
+    sorted(values.items(), key=lambda x: x[1])
+    grid = np.arange(1600, dtype=float).reshape(40, 40)
+    np.argmax(np.where(grid % 7 > 2, grid, -np.inf))
+
+
+def case_benchmarks(size, residences, utilities):
+    """The benchmarked functions for one synthetic state
+
+    Returns:
+        {str: function} - Functions taking no arguments, by name
+    """
+    game = synthetic_game(size, residences, utilities)
+    payloads = turn_payloads(game, TURNS)
+    state = GameState(simulator.copy_info(game.info))
+    state.update_state(payloads[-1])
+    blueprints = [state.residence_blueprints[x.building_name] for x in state.residences]
+    feasible = _feasible_residences(state)
+    updated = GameState(simulator.copy_info(game.info))
+    cycle = itertools.cycle(payloads)
+
+    def pending_work():
+        affordable = [
+            x.name for x in state.available_upgrades if state.funds - x.cost > FUNDS_MED
+        ]
+        state.scheduler.next_construction()
+        state.scheduler.first_missing(["Regulator"])
+        state.scheduler.first_missing(affordable)
+
+    def energy_need():
+        for residence, blueprint in zip(state.residences, blueprints):
+            calculate_energy_need(state, residence, blueprint)
+
+    return {
+        "best_residence_location": lambda: best_residence_location(state),
+        "best_utility_location": lambda: best_utility_location(state, "Mall"),
+        "available_map_slots": lambda: available_map_slots(state),
+        "calculate_energy_need": energy_need,
+        "calculate_energy_needs": lambda: calculate_energy_needs(
+            state, state.residence_table()
+        ),
+        "optimal_residence": lambda: _optimal_residence(state, feasible),
+        "pending_work": pending_work,
+        "update_state": lambda: updated.update_state(next(cycle)),
+        "placement_grid": lambda: PlacementGrid(state.map.cells),
+    }
+
+
+def run(cases=CASES, pattern=None):
+    """
+    Args:
+        pattern (str) - Regular expression selecting the benchmarks by name,
+            None for all of them
+
+    Returns:
+        ({str: float}, {str: float}) - Microseconds per call and the ratio to
+            reference, by "<size>x<residences>/<function>"
+    """
+    results, ratios = {}, {}
+    for size, residences, utilities in cases:
+        for name, function in case_benchmarks(size, residences, utilities).items():
+            name = f"{size}x{residences}/{name}"
+            if pattern is None or re.search(pattern, name):
+                results[name] = round(timeit(function), 3)
+                ratios[name] = round(relative(function), 4)
+    return results, ratios
+
+
+def compare(ratios, baseline, tolerance=TOLERANCE):
+    """
+    Args:
+        ratios ({str: float}) - Ratios to reference by benchmark, see run
+        baseline ({str: float}) - The same of the baseline
+
+    Returns:
+        {str: dict} - Baseline and current ratio to reference, their ratio and
+        regression flag per benchmark present in both
+    """
+    comparison = {}
+    for name, current in ratios.items():
+        if name not in baseline:
+            continue
+        ratio = current / baseline[name] if baseline[name] else 1
+        comparison[name] = {
+            "baseline": baseline[name],
+            "current": current,
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance,
+        }
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="logic.py and GameState benchmarks")
+    parser.add_argument("-o", "--output", help="also write the report to this file")
+    parser.add_argument("-b", "--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("-t", "--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("-k", "--pattern", help="regex selecting the benchmarks")
+    args = parser.parse_args()
+
+    results, ratios = run(pattern=args.pattern)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "relative": ratios,
+    }
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    if args.save_baseline:
+        if args.pattern is not None:
+            for key in ("results", "relative"):
+                report[key] = {**baseline.get(key, {}), **report[key]}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        comparison = compare(ratios, baseline.get("relative", {}), args.tolerance)
+        slow = [name for name, x in comparison.items() if x["regression"]]
+        if slow:
+            # Timings are noisy, a regression has to show up in a second run
+            _, retimed = run(pattern="^(%s)$" % "|".join(map(re.escape, slow)))
+            ratios.update({name: min(ratios[name], retimed[name]) for name in slow})
+            comparison = compare(ratios, baseline.get("relative", {}), args.tolerance)
+        report["comparison"] = comparison
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    regressions = [
+        name for name, x in report.get("comparison", {}).items() if x["regression"]
+    ]
+    if regressions:
+        print("Regressions: " + ", ".join(regressions), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,75 @@
+import argparse
+import gc
+import math
+import sys
+import time
+import tracemalloc
+
+import simulator
+from benchmarks.payloads import synthetic_game, turn_payloads
+from game_state import GameState
+
+
+def object_size(obj):
+    """Size of an object including its instance dict, if it has one"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def measure(residences, turns=100):
+    """Measures what GameState.update_state allocates per turn. The previous
+    turn's buildings are kept alive while measuring so freed objects don't hide
+    the new allocations.
+
+    Args:
+        residences (int) - Number of residences in the city
+        turns (int) - Number of turns to average over
+
+    Returns:
+        dict - Retained bytes, peak bytes allocated per turn and time per turn
+    """
+    utilities = residences // 4
+    size = math.ceil(math.sqrt((residences + utilities) * 1.5)) + 1
+    game = synthetic_game(size, residences, utilities)
+    payloads = turn_payloads(game, turns)
+    state = GameState(simulator.copy_info(game.info))
+
+    gc.collect()
+    tracemalloc.start()
+    state.update_state(payloads[0])
+    gc.collect()
+    allocated = []
+    for payload in payloads:
+        previous = (state.residences, state.utilities)
+        before, _ = tracemalloc.get_traced_memory()
+        state.update_state(payload)
+        allocated.append(tracemalloc.get_traced_memory()[0] - before)
+        del previous
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for payload in payloads:
+        state.update_state(payload)
+    elapsed = time.perf_counter() - start
+    return {
+        "residences": residences,
+        "residence_bytes": object_size(state.residences[0]),
+        "bytes_per_turn": sum(allocated) / len(allocated),
+        "us_per_turn": 1e6 * elapsed / turns,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="update_state memory benchmark")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10, 50, 200])
+    parser.add_argument("-t", "--turns", type=int, default=100)
+    args = parser.parse_args()
+    print(f"{'Residences':>10}{'Bytes/obj':>11}{'Bytes/turn':>12}{'us/turn':>10}")
+    for residences in args.sizes:
+        result = measure(residences, args.turns)
+        print(
+            f"{result['residences']:>10}{result['residence_bytes']:>11}"
+            f"{result['bytes_per_turn']:>12.0f}{result['us_per_turn']:>10.1f}"
+        )
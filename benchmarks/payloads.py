@@ -0,0 +1,56 @@
+import random
+
+import simulator
+from constants import *
+
+# Synthetic but realistic server payloads for the benchmarks, built with the
+# simulator so they have exactly the shape the game server returns.
+
+
+def synthetic_game(size=10, residences=20, utilities=5, seed=0):
+    """Creates a started simulator game with buildings on random free cells
+
+    Args:
+        size (int) - Side length of the map
+        residences (int) - Number of residences
+        utilities (int) - Number of utilities
+        seed (int) - Seed for the map and building placement
+
+    Returns:
+        SimGame - The game, info holds the game info payload
+    """
+    rng = random.Random(seed)
+    info = simulator.generate_map_info("training1", seed)
+    info["map"] = [
+        [
+            POS_TREE if rng.random() < simulator.TREE_DENSITY else POS_EMPTY
+            for _ in range(size)
+        ]
+        for _ in range(size)
+    ]
+    game = simulator.SimGame(info)
+    free = [(x, y) for x in range(size) for y in range(size) if info["map"][x][y] == 0]
+    rng.shuffle(free)
+    if residences + utilities > len(free):
+        raise ValueError("Not enough free cells on the map")
+    blueprints = info["availableResidenceBuildings"]
+    for x, y in free[:residences]:
+        building = simulator.SimBuilding(rng.choice(blueprints), x, y)
+        building.build_progress = rng.choice([100, 100, 100, 60])
+        building.current_pop = rng.randrange(building.blueprint["maxPop"] + 1)
+        building.temperature = rng.uniform(15, 25)
+        building.health = rng.uniform(30, 100)
+        building.upgrades = rng.sample([x["name"] for x in simulator.UPGRADES], 2)
+        building.effects = list(building.upgrades)
+        game.buildings[(x, y)] = building
+    blueprints = info["availableUtilityBuildings"]
+    for x, y in free[residences : residences + utilities]:
+        building = simulator.SimBuilding(rng.choice(blueprints), x, y)
+        building.build_progress = 100
+        game.buildings[(x, y)] = building
+    return game
+
+
+def turn_payloads(game, turns):
+    """Advances the game by waiting and returns the state payload of every turn"""
+    return [game.act("wait") for _ in range(turns)]
@@ -14,6 +14,14 @@ FUNDS_HIGH = 36000
 
 HEALTH_MIN = 50
 
+# Heuristic scores kept before the cache is cleared
+HEURISTIC_CACHE_SIZE = 4096
+
+# Strategy
+QUEUE_HAPPINESS_MAX = 20  # No new residences at or above this queue happiness
+UTILITY_INTERVAL = 3  # A utility is placed every UTILITY_INTERVAL buildings
+WINDTURBINE_RESIDENCES = 5  # Residences before wind turbines are preferred
+
 # Map position identifiers
 POS_EMPTY = 0
 POS_TREE = 1
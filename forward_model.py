@@ -0,0 +1,84 @@
+from typing import Dict, Tuple
+
+from simulator import SimGame, copy_info, sim_action
+
+# Predicts the state an action will return by playing it on a SimGame restored
+# from the current state, and measures how far the backend's actual answer
+# drifts from the prediction. The simulator's rules are estimates, so drift
+# against the game server shows where they are off.
+
+# State values compared between prediction and answer
+STATE_FIELDS = ("funds", "totalCo2", "totalHappiness", "currentTemp", "housingQueue")
+RESIDENCE_FIELDS = ("currentPop", "temperature", "health", "buildProgress")
+
+
+class Drift:
+    """Mean and max absolute prediction error per field"""
+
+    def __init__(self):
+        self.predictions: int = 0
+        self.total: Dict[str, float] = {}
+        self.max: Dict[str, float] = {}
+        self.missing_buildings: int = 0
+
+    def add(self, field: str, predicted: float, actual: float):
+        error = abs(predicted - actual)
+        self.total[field] = self.total.get(field, 0) + error
+        if error > self.max.get(field, 0):
+            self.max[field] = error
+
+    def report(self):
+        """
+        :return: {str: (float, float)} - (mean, max) absolute error per field
+        """
+        return {
+            field: (total / self.predictions, self.max.get(field, 0))
+            for field, total in self.total.items()
+        }
+
+
+class ForwardModel:
+    def __init__(self):
+        self.info: dict = None
+        self.drift: Drift = Drift()
+
+    def start(self, info: dict):
+        """
+        Starts predicting a new game.
+        :param info: dict - the game info, before the client changes its map
+        """
+        self.info = copy_info(info)
+        self.drift = Drift()
+
+    def predict(self, state: dict, name: str, body: dict = None):
+        """
+        Predicts the state returned by an action.
+        :param state: dict - the current state, as returned by the backend
+        :param name: string - the api.py action function, e.g. "build"
+        :param body: dict - the request body of the action
+        :return: dict - the predicted state
+        """
+        game = SimGame.restore(self.info, state)
+        return game.act(*sim_action(name, body))
+
+    def compare(self, predicted: dict, actual: dict):
+        """
+        Adds the difference between a predicted and the actual state to drift.
+        """
+        drift = self.drift
+        drift.predictions += 1
+        for field in STATE_FIELDS:
+            drift.add(field, predicted[field], actual[field])
+        residences = _by_position(predicted["residenceBuildings"])
+        for values in actual["residenceBuildings"]:
+            position = values["position"]
+            prediction = residences.get((position["x"], position["y"]))
+            if prediction is None:
+                drift.missing_buildings += 1
+                continue
+            for field in RESIDENCE_FIELDS:
+                drift.add(field, prediction[field], values[field])
+
+
+def _by_position(buildings) -> Dict[Tuple[int, int], dict]:
+    return {(x["position"]["x"], x["position"]["y"]): x for x in buildings}
@@ -1,38 +1,153 @@
-from typing import Tuple
+import time
+from typing import List, NamedTuple, Tuple
 
 import api
+import profiling
+import simulator
+from forward_model import ForwardModel
 from game_state import GameState
+from pipeline import Pipeline
+from prefetch import Prefetcher
+
+# Modules implementing the api.py functions that GameLayer can play through
+BACKENDS = {"remote": api, "local": simulator}
+
+# GameLayer methods that send an action and advance the game
+ACTIONS = (
+    "place_foundation",
+    "build",
+    "maintenance",
+    "demolish",
+    "adjust_energy_level",
+    "wait",
+    "buy_upgrade",
+)
+
+
+class Action(NamedTuple):
+    name: str
+    args: tuple = ()
+
+
+class ActionStats:
+    """Number of actions sent and the time spent waiting for them"""
+
+    def __init__(self):
+        self.actions: int = 0
+        self.seconds: float = 0
+
+    def record(self, seconds: float):
+        self.actions += 1
+        self.seconds += seconds
+
+    @property
+    def actions_per_second(self):
+        return self.actions / self.seconds if self.seconds else 0
+
+
+def action_request(name: str, *args):
+    """
+    Builds the request of a GameLayer action, shared by GameLayer and
+    AsyncGameLayer.
+    :param name: string - the action, one of ACTIONS
+    :param args: the arguments of the GameLayer method
+    :return: (str, tuple) - the backend function, e.g. "adjust_energy", and
+    the request body arguments it takes before the game id
+    """
+    if name == "place_foundation":
+        pos, building_name = args
+        position = {"X": pos[0], "Y": pos[1]}
+        return name, ({"Position": position, "BuildingName": building_name},)
+    if name == "build":
+        (pos,) = args
+        return name, ({"position": {"X": pos[0], "Y": pos[1]}},)
+    if name in ("maintenance", "demolish"):
+        (pos,) = args
+        return name, ({"position": {"x": pos[0], "y": pos[1]}},)
+    if name == "adjust_energy_level":
+        pos, value = args
+        position = {"x": pos[0], "y": pos[1]}
+        return "adjust_energy", ({"position": position, "value": value},)
+    if name == "wait":
+        return name, ()
+    if name == "buy_upgrade":
+        pos, upgrade = args
+        position = {"x": pos[0], "y": pos[1]}
+        return "buy_upgrades", ({"position": position, "upgradeAction": upgrade},)
+    raise ValueError("Unknown action " + name)
+
+
+def get_backend(name: str):
+    """
+    Returns the backend module with the given name.
+    :param name: string - "remote" for the game server or "local" for the simulator
+    """
+    return BACKENDS[name]
 
 
 class GameLayer:
-    def __init__(self, api_key):
+    def __init__(self, api_key, backend=api):
         self.game_state: GameState = None
         self.api_key: str = api_key
+        self.backend = backend
+        self.batch: List[Tuple] = None  # Queued (name, body), see begin_batch
+        self.stats: ActionStats = ActionStats()
+        # Set to a ForwardModel to predict every action and measure the drift
+        self.forward_model: ForwardModel = None
+        self.state_values: dict = None  # Last state returned by the backend
+        self.prediction: dict = None  # Predicted state of the last action
+        # Set to a Pipeline, with a forward_model, to predict and decide on a
+        # worker thread during requests instead
+        self.pipeline: Pipeline = None
+        # Set to a Prefetcher to create the next game during the current one
+        self.prefetcher: Prefetcher = None
 
-    def new_game(self, map_name: str = "training0"):
+    def new_game(self, map_name: str = "training0", seed: int = None):
         """
         Create a new game.
+        :param seed: int - seed of the generated map, only used by the local backend
         """
         if map_name:
             game_options = {"mapName": map_name}
         else:
             game_options = ""
+        if seed is not None:
+            game_options = dict(game_options or {}, seed=seed)
+
+        info = self.backend.new_game(self.api_key, game_options)
+        if self.forward_model:
+            self.forward_model.start(info)
+        self.game_state = GameState(info)
 
-        self.game_state = GameState(api.new_game(self.api_key, game_options))
+    def use_prefetched(self, map_name: str, seed: int = None):
+        """
+        Switches to the game the prefetcher started for map_name and seed.
+        :return: bool - False if there is none, the game has to be created
+        with new_game and start_game instead
+        """
+        game = self.prefetcher and self.prefetcher.take(map_name, seed)
+        if not game:
+            return False
+        if self.forward_model:
+            self.forward_model.start(game.info)
+        self.game_state = game.game_state
+        self.state_values = game.state_values
+        return True
 
     def end_game(self):
         """
         End the current game
         """
-        api.end_game(self.api_key, self.game_state.game_id)
+        self.backend.end_game(self.api_key, self.game_state.game_id)
 
     def start_game(self):
         """
         Starts the game.
         """
-        self.game_state.update_state(
-            api.start_game(self.api_key, self.game_state.game_id)
+        self.state_values = self.backend.start_game(
+            self.api_key, self.game_state.game_id
         )
+        self.game_state.update_state(self.state_values)
 
     def place_foundation(self, pos: Tuple[int, int], building_name: str):
         """
@@ -40,41 +155,28 @@ class GameLayer:
         :param pos: (int, int) - the position
         :param building_name: string - the name, check available_residence_buildings or available_residence_utilities for which buildings are available
         """
-        position = {"X": pos[0], "Y": pos[1]}
-        foundation = {"Position": position, "BuildingName": building_name}
-        self.game_state.update_state(
-            api.place_foundation(self.api_key, foundation, self.game_state.game_id)
-        )
+        self._act("place_foundation", pos, building_name)
 
     def build(self, pos: Tuple[int, int]):
         """
         Continues the construction of a building at the given position.
         :param pos: (int, int) - the position
         """
-        position = {"position": {"X": pos[0], "Y": pos[1]}}
-        self.game_state.update_state(
-            api.build(self.api_key, position, self.game_state.game_id)
-        )
+        self._act("build", pos)
 
     def maintenance(self, pos: Tuple[int, int]):
         """
         Performs maintenance on the building at the given position.
         :param pos: (int, int) - the position
         """
-        position = {"position": {"x": pos[0], "y": pos[1]}}
-        self.game_state.update_state(
-            api.maintenance(self.api_key, position, self.game_state.game_id)
-        )
+        self._act("maintenance", pos)
 
     def demolish(self, pos: Tuple[int, int]):
         """
         Demolishes the building at the given position.
         :param pos: (int, int) - the position
         """
-        position = {"position": {"x": pos[0], "y": pos[1]}}
-        self.game_state.update_state(
-            api.demolish(self.api_key, position, self.game_state.game_id)
-        )
+        self._act("demolish", pos)
 
     def adjust_energy_level(self, pos: Tuple[int, int], value: float):
         """
@@ -82,20 +184,13 @@ class GameLayer:
         :param pos: (int, int) - the position
         :param value: float - the new requested value
         """
-        position = {"x": pos[0], "y": pos[1]}
-        self.game_state.update_state(
-            api.adjust_energy(
-                self.api_key,
-                {"position": position, "value": value},
-                self.game_state.game_id,
-            )
-        )
+        self._act("adjust_energy_level", pos, value)
 
     def wait(self):
         """
         Advances the game by one turn.
         """
-        self.game_state.update_state(api.wait(self.api_key, self.game_state.game_id))
+        self._act("wait")
 
     def buy_upgrade(self, pos: Tuple[int, int], upgrade: str):
         """
@@ -106,35 +201,101 @@ class GameLayer:
         :param pos: (int, int) - the position
         :param upgrade: string - the upgrade to purchase
         """
-        position = {"x": pos[0], "y": pos[1]}
-        self.game_state.update_state(
-            api.buy_upgrades(
-                self.api_key,
-                {"position": position, "upgradeAction": upgrade},
-                self.game_state.game_id,
+        self._act("buy_upgrade", pos, upgrade)
+
+    def begin_batch(self):
+        """
+        Queues the following actions instead of sending them, until submit_batch.
+        """
+        if self.batch is None:
+            self.batch = []
+
+    def submit_batch(self):
+        """
+        Sends the queued actions back to back over the backend's kept-alive
+        connection and applies only the last returned state. Errors and
+        messages of all the actions are kept. The actions after one that
+        fails are not sent.
+        """
+        batch, self.batch = self.batch, None
+        if not batch:
+            return
+        errors, messages = [], []
+        state = None
+        for sent, (name, body) in enumerate(batch):
+            response = self._send(name, *body)
+            if response is None:
+                print(
+                    f"Batch stopped at a failed {name},"
+                    f" {len(batch) - sent - 1} queued actions not sent"
+                )
+                break
+            state = response
+            errors += state["errors"]
+            messages += state["messages"]
+        if state is None:
+            return
+        state["errors"], state["messages"] = errors, messages
+        self.game_state.update_state(state)
+
+    def _act(self, action, *args):
+        name, body = action_request(action, *args)
+        if self.batch is not None:
+            self.batch.append((name, body))
+        else:
+            self.game_state.update_state(self._send(name, *body))
+
+    def _send(self, name, *body):
+        prediction = self._before_send(name, body)
+        start = time.perf_counter()
+        with profiling.timer("action " + name):
+            state = getattr(self.backend, name)(
+                self.api_key, *body, self.game_state.game_id
             )
-        )
+        self._after_send(state, prediction, time.perf_counter() - start)
+        return state
+
+    def _before_send(self, name, body):
+        """Starts the speculation or predicts the state of an action, returns
+        the prediction
+        """
+        if self.state_values:
+            if self.pipeline:
+                self.pipeline.speculate(self.state_values, name, *body)
+            elif self.forward_model:
+                return self.forward_model.predict(self.state_values, name, *body)
+        return None
+
+    def _after_send(self, state, prediction, seconds):
+        """Records an action's response, see _before_send"""
+        self.stats.record(seconds)
+        if state is not None:
+            if prediction is not None:
+                self.forward_model.compare(prediction, state)
+            self.state_values = state
+        self.prediction = prediction
 
     def get_score(self):
         """
         Gets the score for the game.
         :return An object with partial and total scores.
         """
-        return api.get_score(self.api_key, self.game_state.game_id)
+        return self.backend.get_score(self.api_key, self.game_state.game_id)
 
     def get_game_info(self, game_id: str):
         """
         Gets the game info of an already ongoing game and updates the state.
         :param game_id: string - the id of the game to get info about.
         """
-        self.game_state = GameState(api.get_game_info(self.api_key, game_id))
+        self.game_state = GameState(self.backend.get_game_info(self.api_key, game_id))
 
     def get_game_state(self, game_id: str):
         """
         Gets the game state of an already ongoing game and updates the state. Can be used to resume a game.
         :param game_id: string - the id of the game to get the state.
         """
-        self.game_state.update_state(api.get_game_state(self.api_key, game_id))
+        self.state_values = self.backend.get_game_state(self.api_key, game_id)
+        self.game_state.update_state(self.state_values)
 
     def get_blueprint(self, building_name: str):
         """
@@ -151,27 +312,42 @@ class GameLayer:
         Returns the matching blueprint for a residence
         :param building_name: string - the name of the building to get a blueprint.
         """
-        for blueprint in self.game_state.available_residence_buildings:
-            if blueprint.building_name == building_name:
-                return blueprint
-        return None
+        return self.game_state.residence_blueprints.get(building_name)
 
     def get_utility_blueprint(self, building_name: str):
         """
         Return the matching blueprint for a utility building
         :param building_name: string - the name of the building to get a blueprint.
         """
-        for blueprint in self.game_state.available_utility_buildings:
-            if blueprint.building_name == building_name:
-                return blueprint
-        return None
+        return self.game_state.utility_blueprints.get(building_name)
 
     def get_effect(self, effect_name: str):
         """
         Return the matching effect for an effect name.
         :param effect_name: string - the name of the effect to get.
         """
-        for effect in self.game_state.effects:
-            if effect.name == effect_name:
-                return effect
-        return None
+        return self.game_state.effects_by_name.get(effect_name)
+
+    def perform(self, action: Action):
+        """
+        Performs an action recorded by ActionRecorder.
+        :param action: Action - the action
+        """
+        getattr(self, action.name)(*action.args)
+
+
+class ActionRecorder:
+    """
+    Stands in for a GameLayer while the strategy decides. Calls to the action
+    methods are recorded instead of sent, everything else is forwarded to the
+    wrapped layer.
+    """
+
+    def __init__(self, game_layer):
+        self.game_layer = game_layer
+        self.actions: List[Action] = []
+
+    def __getattr__(self, name):
+        if name in ACTIONS:
+            return lambda *args: self.actions.append(Action(name, args))
+        return getattr(self.game_layer, name)
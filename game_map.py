@@ -0,0 +1,50 @@
+from typing import Callable, List, Set, Tuple
+
+from constants import *
+
+
+class GameMap:
+    """The map identifiers of a game, indexed as map[x][y], with the set of
+    empty slots kept up to date by set. Listeners, e.g. the PlacementGrid,
+    are told about every changed cell.
+    """
+
+    def __init__(self, map_values):
+        self.size: int = len(map_values)
+        self.cells: List[List[int]] = [list(x) for x in map_values]
+        self.free: Set[Tuple[int, int]] = {
+            (x, y)
+            for x, row in enumerate(self.cells)
+            for y, value in enumerate(row)
+            if value == POS_EMPTY
+        }
+        # Called with (x, y, value) after a cell changes
+        self.listeners: List[Callable[[int, int, int], None]] = []
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, x: int) -> List[int]:
+        """Row x, so cells read as map[x][y] like the raw map. Rows must not
+        be written to, cells change through set.
+        """
+        return self.cells[x]
+
+    def set(self, pos: Tuple[int, int], value: int):
+        """Changes the identifier of a single cell, O(1) plus the listeners
+
+        Args:
+            pos ((int, int)) - The position
+            value (int) - The new map identifier
+        """
+        x, y = pos
+        old = self.cells[x][y]
+        if old == value:
+            return
+        self.cells[x][y] = value
+        if old == POS_EMPTY:
+            self.free.discard((x, y))
+        elif value == POS_EMPTY:
+            self.free.add((x, y))
+        for listener in self.listeners:
+            listener(x, y, value)
@@ -1,4 +1,10 @@
-from typing import List
+from typing import Dict, List, Tuple
+
+import profiling
+from game_map import GameMap
+from placement import PlacementGrid
+from residence_table import ResidenceTable
+from scheduler import Scheduler
 
 
 class GameState:
@@ -8,7 +14,9 @@ class GameState:
         self.max_turns: int = map_values["maxTurns"]
         self.max_temp: float = map_values["maxTemp"]
         self.min_temp: float = map_values["minTemp"]
-        self.map: List[List[int]] = map_values["map"]
+        self.map: GameMap = GameMap(map_values["map"])
+        self.placement: PlacementGrid = PlacementGrid(self.map.cells)
+        self.map.listeners.append(self.placement.set)
         self.energy_levels: List[EnergyLevel] = []
         for level in map_values["energyLevels"]:
             self.energy_levels.append(EnergyLevel(level))
@@ -26,6 +34,15 @@ class GameState:
         self.effects: List[Effect] = []
         for effect in map_values["effects"]:
             self.effects.append(Effect(effect))
+        # Name lookups for the lists above
+        self.residence_blueprints: Dict[str, BlueprintResidenceBuilding] = {
+            x.building_name: x for x in self.available_residence_buildings
+        }
+        self.utility_blueprints: Dict[str, BlueprintUtilityBuilding] = {
+            x.building_name: x for x in self.available_utility_buildings
+        }
+        self.effects_by_name: Dict[str, Effect] = {x.name: x for x in self.effects}
+        self.scheduler: Scheduler = Scheduler(self.utility_blueprints)
 
         self.turn: int = 0
         self.funds: float = 0
@@ -36,12 +53,19 @@ class GameState:
         self.housing_queue: int = 0
         self.residences: List[Residence] = []
         self.utilities: List[Utility] = []
+        self.buildings: Dict[Tuple[int, int], Building] = {}  # By (X, Y)
+        self.changes: StateChanges = StateChanges()
+        self.residence_counts: Dict[str, int] = {}  # By building name
+        # See logic.cached_residence_heuristic_score
+        self.heuristic_cache: Dict[Tuple[str, int, bool], float] = {}
+        self._residence_table: ResidenceTable = None
         self.errors: List[str] = []
         self.messages: List[str] = []
         self.total_pop = 0
         self.current_score = 0
         self.max_score = 0
 
+    @profiling.timed("update_state")
     def update_state(self, state):
         self.turn = state["turn"]
         self.funds = state["funds"]
@@ -50,15 +74,35 @@ class GameState:
         self.current_temp = state["currentTemp"]
         self.queue_happiness = state["queueHappiness"]
         self.housing_queue = state["housingQueue"]
-        self.residences = []
-        for building in state["residenceBuildings"]:
-            self.residences.append(Residence(building))
-        self.utilities = []
-        for building in state["utilityBuildings"]:
-            self.utilities.append(Utility(building))
+        # Buildings are matched to last turn's by position and updated in place
+        self.changes = StateChanges()
+        buildings = {}
+        self.residences = self._update_buildings(
+            state["residenceBuildings"], Residence, buildings
+        )
+        self.utilities = self._update_buildings(
+            state["utilityBuildings"], Utility, buildings
+        )
+        for pos, building in self.buildings.items():
+            if pos not in buildings:
+                self.changes.removed.append(building)
+        self.buildings = buildings
+        self._residence_table = None
+        self.scheduler.update(self.changes)
+        counts = self.residence_counts
+        for building in self.changes.new:
+            if type(building) is Residence:
+                counts[building.building_name] = (
+                    counts.get(building.building_name, 0) + 1
+                )
+        for building in self.changes.removed:
+            if type(building) is Residence:
+                counts[building.building_name] -= 1
         self.errors = state["errors"]
         self.messages = state["messages"]
-        self.total_pop = sum(x.current_pop for x in self.residences)
+        self.total_pop = 0
+        for residence in self.residences:
+            self.total_pop += residence.current_pop
         self.current_score = max(
             15 * self.total_pop + 0.1 * self.total_happiness - self.total_co2, 0
         )
@@ -68,8 +112,48 @@ class GameState:
             else self.max_score
         )
 
+    def residence_table(self):
+        """The residences as NumPy columns, built at most once per update"""
+        if self._residence_table is None:
+            self._residence_table = ResidenceTable(self)
+        return self._residence_table
+
+    def _update_buildings(self, values, building_type, buildings):
+        updated = []
+        for building in values:
+            position = building["position"]
+            pos = (position["x"], position["y"])
+            old = self.buildings.get(pos)
+            if (
+                old is None
+                or type(old) is not building_type
+                or old.building_name != building["buildingName"]
+            ):
+                if old is not None:
+                    self.changes.removed.append(old)
+                old = building_type(building)
+                self.changes.new.append(old)
+            elif old.update(building):
+                self.changes.changed.append(old)
+            updated.append(old)
+            buildings[pos] = old
+        return updated
+
+
+class StateChanges:
+    """Buildings that were added, removed or changed by the last update"""
+
+    __slots__ = ("new", "removed", "changed")
+
+    def __init__(self):
+        self.new: List[Building] = []
+        self.removed: List[Building] = []
+        self.changed: List[Building] = []
+
 
 class EnergyLevel:
+    __slots__ = ("energy_threshold", "cost_per_mwh", "co2_per_mwh")
+
     def __init__(self, level_values):
         self.energy_threshold: int = level_values["energyThreshold"]
         self.cost_per_mwh: float = level_values["costPerMwh"]
@@ -77,6 +161,16 @@ class EnergyLevel:
 
 
 class Blueprint:
+    __slots__ = (
+        "building_name",
+        "cost",
+        "co2_cost",
+        "base_energy_need",
+        "build_speed",
+        "type",
+        "release_tick",
+    )
+
     def __init__(self, blueprint):
         self.building_name: str = blueprint["buildingName"]
         self.cost: int = blueprint["cost"]
@@ -88,6 +182,8 @@ class Blueprint:
 
 
 class BlueprintUtilityBuilding(Blueprint):
+    __slots__ = ("effects", "queue_increase")
+
     def __init__(self, blueprint_building):
         super().__init__(blueprint_building)
         self.effects: [str] = blueprint_building["effects"]
@@ -95,6 +191,15 @@ class BlueprintUtilityBuilding(Blueprint):
 
 
 class BlueprintResidenceBuilding(Blueprint):
+    __slots__ = (
+        "max_pop",
+        "income_per_pop",
+        "emissivity",
+        "maintenance_cost",
+        "decay_rate",
+        "max_happiness",
+    )
+
     def __init__(self, blueprint_building):
         super().__init__(blueprint_building)
         self.max_pop: int = blueprint_building["maxPop"]
@@ -106,6 +211,8 @@ class BlueprintResidenceBuilding(Blueprint):
 
 
 class Upgrade:
+    __slots__ = ("name", "effect", "cost")
+
     def __init__(self, upgrade):
         self.name: str = upgrade["name"]
         self.effect: str = upgrade["effect"]
@@ -113,6 +220,19 @@ class Upgrade:
 
 
 class Effect:
+    __slots__ = (
+        "name",
+        "radius",
+        "emissivity_multiplier",
+        "decay_multiplier",
+        "building_income_increase",
+        "max_happiness_increase",
+        "mwh_production",
+        "base_energy_mwh_increase",
+        "co2_per_pop_increase",
+        "decay_increase",
+    )
+
     def __init__(self, effect):
         self.name: str = effect["name"]
         self.radius: int = effect["radius"]
@@ -127,17 +247,47 @@ class Effect:
 
 
 class Building:
+    __slots__ = (
+        "building_name",
+        "X",
+        "Y",
+        "effective_energy_in",
+        "build_progress",
+        "can_be_demolished",
+        "effects",
+    )
+
     def __init__(self, building):
+        position = building["position"]
         self.building_name: str = building["buildingName"]
-        self.X: int = building["position"]["x"]
-        self.Y: int = building["position"]["y"]
+        self.X: int = position["x"]
+        self.Y: int = position["y"]
         self.effective_energy_in: float = building["effectiveEnergyIn"]
         self.build_progress: int = building["buildProgress"]
         self.can_be_demolished: bool = building["canBeDemolished"]
         self.effects: List[str] = building["effects"]
 
+    def update(self, building):
+        """Updates the building in place, returns True if anything changed"""
+        build_progress = building["buildProgress"]
+        effects = building["effects"]
+        changed = self.build_progress != build_progress or self.effects != effects
+        self.effective_energy_in = building["effectiveEnergyIn"]
+        self.build_progress = build_progress
+        self.can_be_demolished = building["canBeDemolished"]
+        self.effects = effects
+        return changed
+
 
 class Residence(Building):
+    __slots__ = (
+        "current_pop",
+        "temperature",
+        "requested_energy_in",
+        "happiness_per_tick_per_pop",
+        "health",
+    )
+
     def __init__(self, residence):
         super().__init__(residence)
         self.current_pop: int = residence["currentPop"]
@@ -145,10 +295,22 @@ class Residence(Building):
         self.requested_energy_in: float = residence["requestedEnergyIn"]
         self.happiness_per_tick_per_pop: float = residence["happinessPerTickPerPop"]
         self.health: int = residence["health"]
-        self.X = residence["position"]["x"]
-        self.Y = residence["position"]["y"]
+
+    def update(self, residence):
+        health = residence["health"]
+        temperature = residence["temperature"]
+        changed = (
+            Building.update(self, residence)
+            or self.health != health
+            or self.temperature != temperature
+        )
+        self.current_pop = residence["currentPop"]
+        self.temperature = temperature
+        self.requested_energy_in = residence["requestedEnergyIn"]
+        self.happiness_per_tick_per_pop = residence["happinessPerTickPerPop"]
+        self.health = health
+        return changed
 
 
 class Utility(Building):
-    def __init__(self, utility):
-        super().__init__(utility)
+    __slots__ = ()
@@ -1,5 +1,6 @@
-from collections import defaultdict
+import numpy as np
 
+import profiling
 from constants import *
 
 
@@ -23,15 +24,53 @@ def residence_heuristic_score(state, residence, nr_ticks):
     return 15 * residence.max_pop + 0.1 * happiness - co2
 
 
+def cached_residence_heuristic_score(state, residence, nr_ticks):
+    """residence_heuristic_score memoized on the GameState. The key is the
+    blueprint, nr_ticks and whether a residence of its type is built, which is
+    all the score depends on.
+    """
+    key = (
+        residence.building_name,
+        nr_ticks,
+        state.residence_counts.get(residence.building_name, 0) > 0,
+    )
+    cache = state.heuristic_cache
+    score = cache.get(key)
+    if score is None:
+        if len(cache) >= HEURISTIC_CACHE_SIZE:
+            cache.clear()
+        score = cache[key] = residence_heuristic_score(state, residence, nr_ticks)
+    return score
+
+
+def residences_heuristic_score(state, nr_ticks):
+    """Sum of residence_heuristic_score over the built residences, computed
+    per residence type from state.residence_counts
+
+    Args:
+        state (GameState) - The current game state
+        nr_ticks (int) - Number of ticks the buildings will contribute to the score
+
+    Returns:
+        float - The built residences' contribution to the final score
+    """
+    return sum(
+        count
+        * cached_residence_heuristic_score(
+            state, state.residence_blueprints[building_name], nr_ticks
+        )
+        for building_name, count in state.residence_counts.items()
+        if count
+    )
+
+
 def residence_heuristic_happiness(state, residence, nr_ticks):
     return (
         (
             residence.max_happiness
             + (
                 residence.max_happiness * 0.1
-                if not any(
-                    residence.building_name == y.building_name for y in state.residences
-                )
+                if not state.residence_counts.get(residence.building_name)
                 else 0
             )
         )
@@ -87,6 +126,113 @@ def calculate_energy_need(state, residence, blueprint):
     return max(energy_wanted, base_energy_need + 1e-2)
 
 
+def calculate_energy_needs(state, table):
+    """Vectorized calculate_energy_need for every residence
+
+    Args:
+        state (GameState) - The current game state
+        table (ResidenceTable) - The residences
+    Returns:
+        ndarray - The energy needed per residence
+    """
+    base_energy_need = np.where(
+        table.has_effect("Charger"),
+        table.base_energy_need + 1.8,
+        table.base_energy_need,
+    )
+    emissivity = np.where(
+        table.has_effect("Insulation"), table.emissivity * 0.6, table.emissivity
+    )
+    energy_wanted = (
+        OPT_TEMP
+        - table.temperature
+        - DEGREES_PER_POP * table.pop
+        + (table.temperature - state.current_temp) * emissivity
+    ) / DEGREES_PER_EXCESS_MWH + base_energy_need
+
+    return np.maximum(energy_wanted, base_energy_need + 1e-2)
+
+
+@profiling.timed("maintenance_target")
+def maintenance_target(state, table):
+    """Picks the residence with the lowest health if it needs maintenance
+
+    Args:
+        state (GameState) - The current game state
+        table (ResidenceTable) - The residences
+    Returns:
+        int - Row of the residence, None if no maintenance is needed
+    """
+    if table.size < 1:
+        return None
+    i = int(np.argmin(table.health))
+    if (
+        table.health[i] < HEALTH_MIN
+        and table.happiness[i] < table.max_happiness[i] + 0.16
+        and state.funds - table.maintenance_cost[i] > FUNDS_MIN
+    ):
+        return i
+    return None
+
+
+@profiling.timed("regulation_target")
+def regulation_target(state, table):
+    """Picks the finished residence whose requested energy is furthest from
+    its need, if that difference is at least ENERGY_DIFF_LIMIT
+
+    Args:
+        state (GameState) - The current game state
+        table (ResidenceTable) - The residences
+    Returns:
+        (int, float) - Row of the residence and its energy need, None if no
+        residence needs regulation
+    """
+    energy = calculate_energy_needs(state, table)
+    diff = np.abs(energy - table.requested_energy)
+    candidates = (table.build_progress == 100) & (diff >= ENERGY_DIFF_LIMIT)
+    if not candidates.any():
+        return None
+    i = int(np.argmax(np.where(candidates, diff, -np.inf)))
+    return i, float(energy[i])
+
+
+def maintenance_targets(state, table):
+    """Every residence needing maintenance, lowest health first, as long as
+    the funds cover all of them
+
+    Args:
+        state (GameState) - The current game state
+        table (ResidenceTable) - The residences
+    Returns:
+        ndarray - Rows of the residences
+    """
+    rows = np.flatnonzero(
+        (table.health < HEALTH_MIN) & (table.happiness < table.max_happiness + 0.16)
+    )
+    rows = rows[np.argsort(table.health[rows], kind="stable")]
+    affordable = state.funds - np.cumsum(table.maintenance_cost[rows]) > FUNDS_MIN
+    return rows[affordable.cumprod().astype(bool)]
+
+
+def regulation_targets(state, table):
+    """Every finished residence whose requested energy differs at least
+    ENERGY_DIFF_LIMIT from its need
+
+    Args:
+        state (GameState) - The current game state
+        table (ResidenceTable) - The residences
+    Returns:
+        (ndarray, ndarray) - Rows of the residences and their energy needs
+    """
+    energy = calculate_energy_needs(state, table)
+    rows = np.flatnonzero(
+        (table.build_progress == 100)
+        & (np.abs(energy - table.requested_energy) >= ENERGY_DIFF_LIMIT)
+    )
+    return rows, energy[rows]
+
+
+@profiling.timed("best_residence_location")
 def best_residence_location(state):
     """Logic for determinating the best residence location based on the current game state
 
@@ -96,29 +242,10 @@ def best_residence_location(state):
     Returns:
         (int, int) - x and y coordinates for the best residence location
     """
-    scores = defaultdict(int)
-    available = available_map_slots(state)
-    for x1, y1 in available:
-        scores[(x1, y1)] = 0
-        for x2 in range(len(state.map)):
-            for y2 in range(len(state.map)):
-                d = manhattan_distance(x1, y1, x2, y2)
-                if d > 0:
-                    if d <= 3 and state.map[x2][y2] == POS_EMPTY:
-                        scores[(x1, y1)] += 1 / d
-                    if state.map[x2][y2] == POS_RESIDENCE:
-                        scores[(x1, y1)] += 10 / d
-                    if d <= 3 and state.map[x2][y2] == POS_MALL:
-                        scores[(x1, y1)] += 100 / d
-                    if d <= 2 and state.map[x2][y2] == POS_PARK:
-                        scores[(x1, y1)] += 100 / d
-                    if d <= 2 and state.map[x2][y2] == POS_WINDTURBINE:
-                        scores[(x1, y1)] += 100 / d
-    if not scores:
-        return (-1, -1)
-    return max(scores, key=lambda x: scores[x])  # Key with max value
+    return state.placement.best_residence_location()
 
 
+@profiling.timed("best_utility_location")
 def best_utility_location(state, building_name):
     """Logic for determinating the best utility location based on the current game state
 
@@ -129,67 +256,19 @@ def best_utility_location(state, building_name):
     Returns:
         (int, int) - x and y coordinates for the best residence location
     """
-    scores = defaultdict(int)
-    available = available_map_slots(state)
-    for x1, y1 in available:
-        scores[(x1, y1)] = 0
-        for x2 in range(len(state.map)):
-            for y2 in range(len(state.map)):
-                d = manhattan_distance(x1, y1, x2, y2)
-                if d > 0:
-                    if d <= 3 and state.map[x2][y2] == POS_EMPTY:
-                        scores[(x1, y1)] += 1 / d
-                    if (
-                        d <= 3
-                        and state.map[x2][y2] == POS_RESIDENCE
-                        and building_name == "Mall"
-                    ):
-                        scores[(x1, y1)] += 100 / d
-                    if (
-                        d <= 2
-                        and state.map[x2][y2] == POS_RESIDENCE
-                        and (building_name == "Park" or building_name == "WindTurbine")
-                    ):
-                        scores[(x1, y1)] += 100 / d
-                    if (  # Don't place in range of identical utility
-                        d <= 3 * 2
-                        and state.map[x2][y2] == POS_MALL
-                        and building_name == "Mall"
-                    ):
-                        scores[(x1, y1)] = -1e5
-                    if (  # Don't place in range of identical utility
-                        d <= 2 * 2
-                        and state.map[x2][y2] == POS_PARK
-                        and building_name == "Park"
-                    ):
-                        scores[(x1, y1)] = -1e5
-                    if (  # Don't place in range of identical utility
-                        d <= 2 * 2
-                        and state.map[x2][y2] == POS_WINDTURBINE
-                        and building_name == "WindTurbine"
-                    ):
-                        scores[(x1, y1)] = -1e5
-    if not scores:
-        return (-1, -1)
-    return max(scores, key=lambda x: scores[x])  # Key with max value
+    return state.placement.best_utility_location(building_name)
 
 
 def available_map_slots(state):
-    """Goes through the map and finds available slots
+    """The empty slots of the map, read from the free-slot set of state.map
 
     Args:
         state (GameState) - The current game state
 
     Returns:
-        [(int,int)] - A list of tuples containing ints indicating the available locations
+        [(int,int)] - The available locations, in no particular order
     """
-    # Go through the map and find available slots
-    return [
-        (i, j)
-        for i in range(len(state.map))
-        for j in range(len(state.map))
-        if state.map[i][j] == 0
-    ]
+    return list(state.map.free)
 
 
 def manhattan_distance(x1, y1, x2, y2):
@@ -1,19 +1,48 @@
 import math
 import os
 import sys
-import time
-from datetime import datetime
 
 from dotenv import load_dotenv
 
+import api
+import profiling
+import results
 from constants import *
-from game_layer import GameLayer
+from forward_model import ForwardModel
+from game_layer import GameLayer, get_backend
 from logic import (best_residence_location, best_utility_location,
-                   calculate_energy_need, nr_ticks_left,
-                   residence_heuristic_score)
+                   cached_residence_heuristic_score, maintenance_target,
+                   maintenance_targets, nr_ticks_left, regulation_target,
+                   regulation_targets, residences_heuristic_score)
+from pipeline import MISS, Pipeline
+from planner import Planner
+from prefetch import Prefetcher
+from transport import RecordingTransport
 
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
+# "remote" plays on game.considition.com, "local" on the in-process simulator
+BACKEND = os.getenv("BACKEND", "remote")
+# Directory to record remote games to, see replay.py
+RECORD_DIR = os.getenv("RECORD_DIR")
+if RECORD_DIR:
+    api.transport = RecordingTransport(api.transport, RECORD_DIR)
+# Submit all maintenance and regulation of a turn as one batch, see batched_turn
+BATCH = bool(os.getenv("BATCH"))
+# Predict every action with the simulator and report the drift when VERBOSE
+PREDICT = bool(os.getenv("PREDICT"))
+# Decide the next turn on the predicted state while an action is in flight
+PIPELINE = bool(os.getenv("PIPELINE"))
+# Choose every action with the beam search in planner.py instead of strategy,
+# with PLAN_WORKERS processes running the rollouts
+PLAN = bool(os.getenv("PLAN"))
+PLAN_WORKERS = int(os.getenv("PLAN_WORKERS", "0"))
+# SQLite database the final score of every game is recorded to, see results.py
+RESULTS_DB = os.getenv("RESULTS_DB", results.RESULTS_PATH)
+# Create and start the next unseeded game on the same map during the last turns
+PREFETCH = bool(os.getenv("PREFETCH"))
+# Time the phases of every turn, print a summary and dump a trace per game
+PROFILE = bool(os.getenv("PROFILE"))
 
 # The different map names can be found on considition.com/rules
 # Map name taken as command line argument.
@@ -21,37 +50,95 @@ API_KEY = os.getenv("API_KEY")
 map_name = sys.argv[1] if len(sys.argv) > 1 else "training1"
 VERBOSE = sys.argv[2] if len(sys.argv) > 2 else False
 
-GAME_LAYER: GameLayer = GameLayer(API_KEY)
 
+def configure(game_layer: GameLayer):
+    """Applies the PREDICT, PIPELINE and PREFETCH settings to a game layer"""
+    if PREDICT or PIPELINE or PLAN:
+        game_layer.forward_model = ForwardModel()
+    if PIPELINE:
+        game_layer.pipeline = Pipeline(game_layer)
+    if PREFETCH:
+        game_layer.prefetcher = Prefetcher(game_layer)
+    return game_layer
 
-def main():
+
+GAME_LAYER: GameLayer = configure(GameLayer(API_KEY, get_backend(BACKEND)))
+PLANNER: Planner = Planner(workers=PLAN_WORKERS) if PLAN else None
+
+
+def main(game_map: str = map_name, log_score: bool = True, seed: int = None):
+    """Plays one game on game_map with GAME_LAYER and records the final score
+    in RESULTS_DB.
+    seed is only used by the local backend.
+
+    Returns:
+        int - The final score, None if the game was force quit
+    """
     try:
-        GAME_LAYER.new_game(map_name)
-        print("Starting game: " + GAME_LAYER.game_state.game_id)
-        print("Map:", map_name)
-        GAME_LAYER.start_game()
+        if PROFILE:
+            profiling.enable()
+        if GAME_LAYER.use_prefetched(game_map, seed):
+            print("Starting prefetched game: " + GAME_LAYER.game_state.game_id)
+            print("Map:", game_map)
+        else:
+            GAME_LAYER.new_game(game_map, seed)
+            print("Starting game: " + GAME_LAYER.game_state.game_id)
+            print("Map:", game_map)
+            GAME_LAYER.start_game()
         preprocess_map()  # Make neccessary pre-processing of the map
         # clean_map()  # Demolish existing buildings
+        prefetcher = GAME_LAYER.prefetcher
         while GAME_LAYER.game_state.turn < GAME_LAYER.game_state.max_turns:
+            state = GAME_LAYER.game_state
+            if prefetcher and state.max_turns - state.turn <= prefetcher.turns:
+                prefetcher.prefetch(game_map, seed)
             take_turn()
         print("Done with game: " + GAME_LAYER.game_state.game_id)
         if VERBOSE:
             print("-----------")
             print("Total happiness: ", int(GAME_LAYER.game_state.total_happiness))
             print("Total CO2: ", int(GAME_LAYER.game_state.total_co2))
+            print("Actions/s: ", round(GAME_LAYER.stats.actions_per_second, 1))
+            if GAME_LAYER.forward_model:
+                print("Prediction drift (mean, max):")
+                for field, (
+                    mean,
+                    most,
+                ) in GAME_LAYER.forward_model.drift.report().items():
+                    print(f"  {field}: {mean:.3g}, {most:.3g}")
+            if GAME_LAYER.pipeline:
+                pipeline = GAME_LAYER.pipeline
+                print("Speculation hits/misses: ", pipeline.hits, pipeline.misses)
             print("-----------")
-        print("Final score was: " + str(GAME_LAYER.get_score()["finalScore"]) + " 🚀")
-
-        with open(map_name + ".txt", "a+") as f:
-            f.write(
-                f'{datetime.fromtimestamp(int(time.time()))}: {map_name}, {str(GAME_LAYER.get_score()["finalScore"])}, {GAME_LAYER.game_state.game_id}\n'
+        score = GAME_LAYER.get_score()
+        final_score = score["finalScore"]
+        print("Final score was: " + str(final_score) + " 🚀")
+        if profiling.enabled():
+            profiling.print_summary()
+            print("Trace: " + profiling.dump(GAME_LAYER.game_state.game_id))
+
+        if log_score:
+            store = results.ResultsStore(RESULTS_DB)
+            store.add(
+                GAME_LAYER.game_state.game_id,
+                game_map,
+                score,
+                GAME_LAYER.backend.__name__,
+                results.strategy_params(),
+                results.code_version(),
             )
+            store.close()
+        return final_score
 
     except KeyboardInterrupt:  # End game session in case of exceptions
         print(f"\nForce quit game: {GAME_LAYER.game_state.game_id}")
         GAME_LAYER.end_game()
+        if GAME_LAYER.prefetcher:
+            GAME_LAYER.prefetcher.close()
     except Exception as e:  # Catching generic exceptions
         GAME_LAYER.end_game()
+        if GAME_LAYER.prefetcher:
+            GAME_LAYER.prefetcher.close()
         raise (e)
 
 
@@ -64,15 +151,15 @@ def preprocess_map():
     state = GAME_LAYER.game_state
     for residence in state.residences:
         x, y = residence.X, residence.Y
-        state.map[x][y] = POS_RESIDENCE
+        state.map.set((x, y), POS_RESIDENCE)
     for utility in state.utilities:
         x, y = utility.X, utility.Y
         if utility.building_name == "Park":
-            state.map[x][y] = POS_PARK
+            state.map.set((x, y), POS_PARK)
         elif utility.building_name == "Mall":
-            state.map[x][y] = POS_MALL
+            state.map.set((x, y), POS_MALL)
         elif utility.building_name == "WindTurbine":
-            state.map[x][y] = POS_WINDTURBINE
+            state.map.set((x, y), POS_WINDTURBINE)
 
 
 def clean_map():
@@ -89,7 +176,12 @@ def clean_map():
 def take_turn():
     """Takes a turn"""
     state = GAME_LAYER.game_state
-    strategy(state)
+    profiling.new_turn(state.turn)
+    with profiling.timer("strategy"):
+        if PLANNER:
+            planned_turn(state)
+        elif not (BATCH and batched_turn(state)):
+            strategy(state)
 
     _score = str(int(state.current_score))
     for message in GAME_LAYER.game_state.messages:
@@ -98,6 +190,26 @@ def take_turn():
         print(f"[{_score}]: ", error)
 
 
+def planned_turn(state):
+    """Plays the action chosen by PLANNER
+
+    Args:
+        state (GameState) - The current game state
+    """
+    action = PLANNER.plan(state, GAME_LAYER.forward_model.info, GAME_LAYER.state_values)
+    if action.name == "place_foundation":
+        pos, building_name = action.args
+        if building_name == "Park":
+            state.map.set(pos, POS_PARK)
+        elif building_name == "Mall":
+            state.map.set(pos, POS_MALL)
+        elif building_name == "WindTurbine":
+            state.map.set(pos, POS_WINDTURBINE)
+        else:
+            state.map.set(pos, POS_RESIDENCE)
+    GAME_LAYER.perform(action)
+
+
 def strategy(state):
     """Main logic/strategy for game plan.
 
@@ -123,24 +235,62 @@ def strategy(state):
         GAME_LAYER.wait()
 
 
+def batched_turn(state):
+    """Queues maintenance, regulators and energy regulation for every residence
+    that needs it and submits them as one batch
+
+    Args:
+        state (GameState) - The current game state
+
+    Returns:
+        Bool - False if nothing was queued
+    """
+    table = state.residence_table()
+    funds = state.funds
+    GAME_LAYER.begin_batch()
+    for i in maintenance_targets(state, table):
+        GAME_LAYER.maintenance((int(table.x[i]), int(table.y[i])))
+        funds -= table.maintenance_cost[i]
+    regulator = next(
+        (x for x in state.available_upgrades if x.name == "Regulator"), None
+    )
+    for residence in state.residences:
+        if (
+            regulator
+            and residence.build_progress == 100
+            and "Regulator" not in residence.effects
+            and funds - regulator.cost > FUNDS_MIN
+        ):
+            GAME_LAYER.buy_upgrade((residence.X, residence.Y), "Regulator")
+            funds -= regulator.cost
+    if len(state.residences) > 0 and state.turn >= 2 and funds > FUNDS_MIN:
+        rows, energy = regulation_targets(state, table)
+        for i, value in zip(rows, energy):
+            GAME_LAYER.adjust_energy_level(
+                (int(table.x[i]), int(table.y[i])), float(value)
+            )
+    queued = bool(GAME_LAYER.batch)
+    GAME_LAYER.submit_batch()
+    return queued
+
+
 def residence_maintenance(state):
     """Maintain a residence in need of maintenance
 
     Args:
         state (GameState) - The current game state
     """
-    if len(state.residences) < 1:
+    decisions = _speculative_decisions(state)
+    if decisions and decisions.maintenance is not MISS:
+        if decisions.maintenance:
+            GAME_LAYER.maintenance(decisions.maintenance)
+            return True
         return False
 
-    residence = min(state.residences, key=lambda x: x.health)
-    blueprint = GAME_LAYER.get_residence_blueprint(residence.building_name)
-    if (
-        residence.health < HEALTH_MIN
-        and residence.happiness_per_tick_per_pop
-        < GAME_LAYER.get_blueprint(residence.building_name).max_happiness + 0.16
-        and state.funds - blueprint.maintenance_cost > FUNDS_MIN
-    ):
-        GAME_LAYER.maintenance((residence.X, residence.Y))
+    table = state.residence_table()
+    i = maintenance_target(state, table)
+    if i is not None:
+        GAME_LAYER.maintenance((int(table.x[i]), int(table.y[i])))
         return True
 
 
@@ -157,28 +307,34 @@ def regulate_temperature(state):
         return False
 
     if state.funds > FUNDS_MIN:
-        residences = sorted(
-            state.residences,
-            key=lambda residence: abs(
-                calculate_energy_need(
-                    state,
-                    residence,
-                    GAME_LAYER.get_residence_blueprint(residence.building_name),
-                )
-                - residence.requested_energy_in
-            ),
-            reverse=True,
-        )
-        for residence in residences:
-            if residence.build_progress == 100:
-                blueprint = blueprint = GAME_LAYER.get_residence_blueprint(
-                    residence.building_name
-                )
-                energy = calculate_energy_need(state, residence, blueprint)
+        decisions = _speculative_decisions(state)
+        if decisions and decisions.regulation is not MISS:
+            if decisions.regulation:
+                GAME_LAYER.adjust_energy_level(*decisions.regulation)
+                return True
+            return False
+
+        table = state.residence_table()
+        target = regulation_target(state, table)
+        if target is not None:
+            i, energy = target
+            GAME_LAYER.adjust_energy_level((int(table.x[i]), int(table.y[i])), energy)
+            return True
+
+
+def _speculative_decisions(state):
+    """The decisions GAME_LAYER.pipeline made while the last action was in
+    flight, None if not pipelining. Decisions that don't hold on the
+    actual state are MISS.
+
+    Args:
+        state (GameState) - The current game state
 
-                if abs(energy - residence.requested_energy_in) >= ENERGY_DIFF_LIMIT:
-                    GAME_LAYER.adjust_energy_level((residence.X, residence.Y), energy)
-                    return True
+    Returns:
+        Decisions
+    """
+    if GAME_LAYER.pipeline:
+        return GAME_LAYER.pipeline.decisions(state)
 
 
 def perform_construction(state):
@@ -190,15 +346,10 @@ def perform_construction(state):
     Returns:
         Bool
     """
-    for residence in state.residences:
-        if residence.build_progress < 100:
-            GAME_LAYER.build((residence.X, residence.Y))
-            return True
-
-    for utility in state.utilities:
-        if utility.build_progress < 100:
-            GAME_LAYER.build((utility.X, utility.Y))
-            return True
+    building = state.scheduler.next_construction()
+    if building:
+        GAME_LAYER.build((building.X, building.Y))
+        return True
 
 
 def place_residence(state):
@@ -214,13 +365,17 @@ def place_residence(state):
     if (
         residence
         and state.funds - residence.cost >= FUNDS_MIN
-        and state.queue_happiness < 20
+        and state.queue_happiness < QUEUE_HAPPINESS_MAX
     ):
-        x, y = best_residence_location(state)
+        decisions = _speculative_decisions(state)
+        if decisions and decisions.residence_location is not MISS:
+            x, y = decisions.residence_location
+        else:
+            x, y = best_residence_location(state)
         if x < 0 or y < 0:
             return False
 
-        state.map[x][y] = POS_RESIDENCE
+        state.map.set((x, y), POS_RESIDENCE)
         GAME_LAYER.place_foundation((x, y), residence.building_name)
         return True
 
@@ -235,7 +390,7 @@ def place_utility(state):
         Bool
     """
     # Alternate between utility and residence
-    if (len(state.utilities) + len(state.residences)) % 3:
+    if (len(state.utilities) + len(state.residences)) % UTILITY_INTERVAL:
         return False
 
     utility = _choose_utility(state)
@@ -245,11 +400,11 @@ def place_utility(state):
             return False
 
         if utility.building_name == "Park":
-            state.map[x][y] = POS_PARK
+            state.map.set((x, y), POS_PARK)
         elif utility.building_name == "Mall":
-            state.map[x][y] = POS_MALL
+            state.map.set((x, y), POS_MALL)
         elif utility.building_name == "WindTurbine":
-            state.map[x][y] = POS_WINDTURBINE
+            state.map.set((x, y), POS_WINDTURBINE)
         GAME_LAYER.place_foundation((x, y), utility.building_name)
         return True
 
@@ -270,7 +425,7 @@ def _choose_utility(state):
         for utility in available_utilities
     ]
 
-    if len(state.residences) >= 5:
+    if len(state.residences) >= WINDTURBINE_RESIDENCES:
         utility = next(
             (x for x in utility_blueprints if x.building_name == "WindTurbine"), None
         )
@@ -294,19 +449,18 @@ def residence_regulator(state):
     Returns:
         Bool
     """
-    for residence in state.residences:
-        if residence.build_progress < 100:
-            continue
-        if "Regulator" not in residence.effects:
-            GAME_LAYER.buy_upgrade(
-                (residence.X, residence.Y),
-                "Regulator",
-            )
-            return True
+    residence = state.scheduler.first_missing(["Regulator"])
+    if residence:
+        GAME_LAYER.buy_upgrade(
+            (residence.X, residence.Y),
+            "Regulator",
+        )
+        return True
 
 
 def residence_upgrade(state):
-    """Chooses and buys a upgrade for a residence if needed
+    """Chooses and buys a upgrade for a residence if needed. Only the first
+    residence missing an upgrade that _choose_upgrade can afford is considered.
 
     Args:
         state (GameState) - The current game state
@@ -314,9 +468,11 @@ def residence_upgrade(state):
     Returns:
         Bool
     """
-    for residence in state.residences:
-        if residence.build_progress < 100:
-            continue
+    affordable = [
+        x.name for x in state.available_upgrades if state.funds - x.cost > FUNDS_MED
+    ]
+    residence = state.scheduler.first_missing(affordable)
+    if residence:
         if upgrade := _choose_upgrade(state, residence):
             GAME_LAYER.buy_upgrade(
                 (residence.X, residence.Y),
@@ -370,6 +526,7 @@ def _cheapest_upgrade(state, residence):
         return upgrade
 
 
+@profiling.timed("choose_residence")
 def _choose_residence(state):
     return _optimal_residence(state, _feasible_residences(state))
 
@@ -390,19 +547,13 @@ def _optimal_residence(state, feasible_residences):
     Returns:
         BlueprintResidenceBuilding - The most optimal building
     """
-    current_residences_heuristic = sum(
-        [
-            residence_heuristic_score(
-                state, GAME_LAYER.get_blueprint(y.building_name), nr_ticks_left(state)
-            )
-            for y in state.residences
-        ]
-    )
+    nr_ticks = nr_ticks_left(state)
+    current_residences_heuristic = residences_heuristic_score(state, nr_ticks)
     estimated_final_score = (
         lambda x: state.current_score
         + current_residences_heuristic
-        + residence_heuristic_score(
-            state, x, nr_ticks_left(state) - math.ceil(100 / x.build_speed)
+        + cached_residence_heuristic_score(
+            state, x, nr_ticks - math.ceil(100 / x.build_speed)
         )
     )
     return max(
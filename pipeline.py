@@ -0,0 +1,177 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+
+from game_state import BlueprintResidenceBuilding, Effect, Residence
+from logic import maintenance_target, regulation_target
+from residence_table import ResidenceTable
+
+# Predicts the state an action returns and computes the next turn's decisions
+# on it on a worker thread, while the action's request is outstanding. The
+# prediction is never exact, so each decision is checked against the state the
+# server returns instead, see Pipeline.decisions.
+
+
+class Miss:
+    """A speculative decision that doesn't hold on the actual state"""
+
+    def __repr__(self):
+        return "MISS"
+
+
+MISS = Miss()
+
+
+class Decisions(NamedTuple):
+    # None if no residence needs maintenance, MISS if unknown
+    maintenance: Tuple[int, int]
+    # Position and energy, None if no residence needs regulation, MISS if unknown
+    regulation: Tuple[Tuple[int, int], float]
+    residence_location: Tuple[int, int]  # MISS if the placement changed
+
+
+class PredictedState:
+    """The parts of a GameState the speculative decisions read, built from a
+    predicted state instead of a server response.
+    """
+
+    __slots__ = (
+        "turn",
+        "funds",
+        "current_temp",
+        "residences",
+        "effects_by_name",
+        "residence_blueprints",
+    )
+
+    def __init__(self, state, values):
+        self.turn: int = values["turn"]
+        self.funds: float = values["funds"]
+        self.current_temp: float = values["currentTemp"]
+        self.residences: List[Residence] = [
+            Residence(x) for x in values["residenceBuildings"]
+        ]
+        self.effects_by_name: Dict[str, Effect] = state.effects_by_name
+        self.residence_blueprints: Dict[str, BlueprintResidenceBuilding] = (
+            state.residence_blueprints
+        )
+
+
+class Speculation(NamedTuple):
+    prediction: dict  # The predicted state
+    maintenance: Tuple[int, int]
+    regulation: Tuple[Tuple[int, int], float]
+    residence_location: Tuple[int, int]
+
+
+class Pipeline:
+    def __init__(self, game_layer):
+        self.game_layer = game_layer
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.version: int = None  # Placement version the decisions were made on
+        self.turn: int = None
+        self.result: Decisions = None
+        self.hits: int = 0  # Speculative maintenance and regulation decisions
+        self.misses: int = 0
+
+    def speculate(self, values: dict, name: str, body: dict = None):
+        """
+        Starts predicting the state an action returns and deciding on it.
+        Called by GameLayer right before it sends the action.
+        :param values: dict - the current state, as returned by the backend
+        :param name: string - the api.py action function, e.g. "build"
+        :param body: dict - the request body of the action
+        """
+        self._join()
+        state = self.game_layer.game_state
+        self.version = state.placement.version
+        self.turn = None
+        self.future = self.executor.submit(
+            _speculate, self.game_layer.forward_model, state, values, name, body
+        )
+
+    def decisions(self, state):
+        """
+        Returns the speculative decisions that still hold on the current
+        state, with MISS for the ones that have to be made on it instead.
+        :param state: GameState - the current game state
+        :return: Decisions - None if nothing was speculated for this turn
+        """
+        speculation = self._join()
+        if speculation is not None and speculation.prediction["turn"] == state.turn:
+            self.turn = state.turn
+            self.result = self._verify(state, speculation)
+        if self.turn != state.turn:
+            return None
+        if self.version != state.placement.version:
+            return self.result._replace(residence_location=MISS)
+        return self.result
+
+    def _verify(self, state, speculation):
+        maintenance = _verify_maintenance(state, speculation)
+        regulation = _verify_regulation(state, speculation)
+        for decision in (maintenance, regulation):
+            if decision is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return Decisions(maintenance, regulation, speculation.residence_location)
+
+    def _join(self):
+        """Waits for the speculation and adds its prediction error to the drift"""
+        future, self.future = self.future, None
+        if future is None or future.exception() is not None:
+            return None
+        speculation = future.result()
+        self.game_layer.forward_model.compare(
+            speculation.prediction, self.game_layer.state_values
+        )
+        return speculation
+
+
+def _speculate(forward_model, state, values, name, body):
+    prediction = forward_model.predict(values, name, body)
+    predicted = PredictedState(state, prediction)
+    table = ResidenceTable(predicted)
+    return Speculation(
+        prediction,
+        _maintenance(predicted, table),
+        _regulation(predicted, table),
+        state.placement.best_residence_location(),
+    )
+
+
+def _maintenance(state, table):
+    """The position maintenance_target picks, None if it picks nothing"""
+    i = maintenance_target(state, table)
+    return None if i is None else (int(table.x[i]), int(table.y[i]))
+
+
+def _regulation(state, table):
+    """The position and energy regulation_target picks, None if it picks
+    nothing
+    """
+    target = regulation_target(state, table)
+    if target is None:
+        return None
+    i, energy = target
+    return (int(table.x[i]), int(table.y[i])), energy
+
+
+def _verify_maintenance(state, speculation):
+    """The predicted maintenance if maintenance_target picks the same on
+    state, else MISS
+    """
+    maintenance = _maintenance(state, state.residence_table())
+    return maintenance if maintenance == speculation.maintenance else MISS
+
+
+def _verify_regulation(state, speculation):
+    """The predicted regulation, with the actual energy need, if
+    regulation_target picks the same residence on state, else MISS
+    """
+    regulation = _regulation(state, state.residence_table())
+    predicted = speculation.regulation
+    if (regulation and regulation[0]) == (predicted and predicted[0]):
+        return regulation
+    return MISS
@@ -0,0 +1,258 @@
+from functools import lru_cache
+
+import numpy as np
+
+from constants import *
+
+# (map identifier, radius, weight) terms used when scoring a residence slot.
+# Every cell of the given type within radius adds weight / distance to the
+# score. A radius of None means the whole map is in range.
+RESIDENCE_TERMS = [
+    (POS_EMPTY, 3, 1),
+    (POS_RESIDENCE, None, 10),
+    (POS_MALL, 3, 100),
+    (POS_PARK, 2, 100),
+    (POS_WINDTURBINE, 2, 100),
+]
+
+# Same as above but per utility, the residence term follows the effect radius
+UTILITY_TERMS = {
+    "Mall": [(POS_EMPTY, 3, 1), (POS_RESIDENCE, 3, 100)],
+    "Park": [(POS_EMPTY, 3, 1), (POS_RESIDENCE, 2, 100)],
+    "WindTurbine": [(POS_EMPTY, 3, 1), (POS_RESIDENCE, 2, 100)],
+}
+DEFAULT_UTILITY_TERMS = [(POS_EMPTY, 3, 1)]
+
+# Don't place a utility within twice its effect radius of an identical one
+UTILITY_EXCLUSION = {
+    "Mall": (POS_MALL, 3 * 2),
+    "Park": (POS_PARK, 2 * 2),
+    "WindTurbine": (POS_WINDTURBINE, 2 * 2),
+}
+EXCLUDED_SCORE = -1e5  # Added to excluded cells, which keep their ranking
+# Scores this close to the best one are tied, so the float error of summing in
+# another order or of repeated +/- stamps can't break ties
+SCORE_TOLERANCE = 1e-6
+
+# (map size, radius) tables kept by each cache below, the least recently used
+# map sizes are evicted when games on many map sizes share a process
+TABLE_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def diamond_kernel(size, radius):
+    """Builds a (2*size-1)x(2*size-1) kernel holding 1/d for every cell within
+    manhattan distance radius of the center, 0 elsewhere (and at the center).
+
+    Args:
+        size (int) - The side length of the map the kernel is used on
+        radius (int) - The radius, None for the whole map
+
+    Returns:
+        ndarray - The read-only kernel
+    """
+    axis = np.abs(np.arange(-(size - 1), size))
+    d = axis[:, None] + axis[None, :]
+    in_range = d > 0 if radius is None else (d > 0) & (d <= radius)
+    kernel = np.zeros(d.shape)
+    kernel[in_range] = 1 / d[in_range]
+    kernel.flags.writeable = False
+    return kernel
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def diamond_mask(size, radius):
+    """diamond_kernel > 0, the cells within radius excluding the center"""
+    mask = diamond_kernel(size, radius) > 0
+    mask.flags.writeable = False
+    return mask
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def diamond_offsets(size, radius):
+    """The non-zero entries of diamond_kernel as a list of (dx, dy, 1/d)"""
+    kernel = diamond_kernel(size, radius)
+    center = size - 1
+    return [
+        (int(dx) - center, int(dy) - center, kernel[dx, dy])
+        for dx, dy in np.argwhere(kernel)
+    ]
+
+
+def convolve(mask, radius):
+    """Sums 1/d over all cells set in mask within radius of every cell
+
+    Args:
+        mask (ndarray) - Boolean or weighted grid of source cells
+        radius (int) - The radius, None for the whole map
+
+    Returns:
+        ndarray - Grid of summed weights, same shape as mask
+    """
+    h, w = mask.shape
+    size = max(h, w)
+    out = np.zeros(mask.shape)
+    sources = np.argwhere(mask)
+    offsets = diamond_offsets(size, radius)
+    if len(sources) <= len(offsets):
+        # Few sources, stamp the kernel centered at each of them
+        kernel = diamond_kernel(size, radius)
+        c = size - 1
+        for x, y in sources:
+            out += mask[x, y] * kernel[c - x : c - x + h, c - y : c - y + w]
+    else:
+        # Many sources, shift the whole mask once per kernel offset
+        mask = mask.astype(float)
+        for dx, dy, weight in offsets:
+            out[max(0, -dx) : h - max(0, dx), max(0, -dy) : w - max(0, dy)] += (
+                weight
+                * mask[max(0, dx) : h - max(0, -dx), max(0, dy) : w - max(0, -dy)]
+            )
+    return out
+
+
+def residence_scores(grid):
+    """Placement score of every cell for a new residence
+
+    Args:
+        grid (ndarray) - The map as an integer array
+
+    Returns:
+        ndarray - The score grid
+    """
+    scores = np.zeros(grid.shape)
+    for pos_type, radius, weight in RESIDENCE_TERMS:
+        scores += weight * convolve(grid == pos_type, radius)
+    return scores
+
+
+def utility_scores(grid, building_name):
+    """Placement score of every cell for a new utility
+
+    Args:
+        grid (ndarray) - The map as an integer array
+        building_name (str) - The utility building name
+
+    Returns:
+        ndarray - The score grid
+    """
+    scores = np.zeros(grid.shape)
+    for pos_type, radius, weight in UTILITY_TERMS.get(
+        building_name, DEFAULT_UTILITY_TERMS
+    ):
+        scores += weight * convolve(grid == pos_type, radius)
+    if building_name in UTILITY_EXCLUSION:
+        pos_type, radius = UTILITY_EXCLUSION[building_name]
+        scores[convolve(grid == pos_type, radius) > 0] += EXCLUDED_SCORE
+    return scores
+
+
+def best_location(grid, scores):
+    """Picks the empty cell with the highest score, ties broken in row-major order
+
+    Args:
+        grid (ndarray) - The map as an integer array
+        scores (ndarray) - The score grid
+
+    Returns:
+        (int, int) - x and y coordinates, (-1, -1) if the map is full
+    """
+    scores = np.where(grid == POS_EMPTY, scores, -np.inf)
+    best = scores.max()
+    if best == -np.inf:
+        return (-1, -1)
+    x, y = np.unravel_index(np.argmax(scores >= best - SCORE_TOLERANCE), grid.shape)
+    return int(x), int(y)
+
+
+class PlacementGrid:
+    """Placement scores for residences and every utility, kept up to date as
+    single cells of the map change type instead of being recomputed per query.
+    """
+
+    def __init__(self, map_values):
+        self.grid = np.array(map_values)
+        self.size = max(self.grid.shape)
+        self.scores = {None: residence_scores(self.grid)}
+        self.terms = {None: RESIDENCE_TERMS}
+        self.exclusion = {}
+        self.version = 0  # Incremented on every change of the map
+        for building_name in UTILITY_TERMS:
+            self._add_utility(building_name)
+
+    def _add_utility(self, building_name):
+        self.terms[building_name] = UTILITY_TERMS.get(
+            building_name, DEFAULT_UTILITY_TERMS
+        )
+        scores = np.zeros(self.grid.shape)
+        for pos_type, radius, weight in self.terms[building_name]:
+            scores += weight * convolve(self.grid == pos_type, radius)
+        self.scores[building_name] = scores
+        if building_name in UTILITY_EXCLUSION:
+            pos_type, radius = UTILITY_EXCLUSION[building_name]
+            self.exclusion[building_name] = np.zeros(self.grid.shape, dtype=int)
+            for x, y in np.argwhere(self.grid == pos_type):
+                window, mask = self._window(x, y, radius, diamond_mask)
+                self.exclusion[building_name][window] += mask
+
+    def _window(self, x, y, radius, table=diamond_kernel):
+        """The part of the map within radius of (x, y) and the matching part
+        of the kernel built by table
+        """
+        h, w = self.grid.shape
+        r = self.size - 1 if radius is None else radius
+        x0, x1 = max(0, x - r), min(h, x + r + 1)
+        y0, y1 = max(0, y - r), min(w, y + r + 1)
+        c = self.size - 1
+        kernel = table(self.size, radius)
+        return (
+            (slice(x0, x1), slice(y0, y1)),
+            kernel[c - x + x0 : c - x + x1, c - y + y0 : c - y + y1],
+        )
+
+    def _stamp(self, x, y, pos_type, sign):
+        for key, terms in self.terms.items():
+            for term_type, radius, weight in terms:
+                if term_type == pos_type:
+                    window, kernel = self._window(x, y, radius)
+                    self.scores[key][window] += sign * weight * kernel
+        for building_name, count in self.exclusion.items():
+            excluded_type, radius = UTILITY_EXCLUSION[building_name]
+            if excluded_type == pos_type:
+                window, mask = self._window(x, y, radius, diamond_mask)
+                count[window] += sign * mask
+
+    def set(self, x, y, value):
+        """Changes the type of a single cell, O(radius^2) per affected term
+
+        Args:
+            x (int) - x coordinate
+            y (int) - y coordinate
+            value (int) - The new map identifier
+        """
+        old = self.grid[x, y]
+        if old == value:
+            return
+        self._stamp(x, y, old, -1)
+        self.grid[x, y] = value
+        self._stamp(x, y, value, 1)
+        self.version += 1
+
+    def residence_scores(self):
+        return self.scores[None]
+
+    def utility_scores(self, building_name):
+        if building_name not in self.scores:
+            self._add_utility(building_name)
+        scores = self.scores[building_name]
+        if building_name in self.exclusion:
+            scores = np.where(
+                self.exclusion[building_name] > 0, EXCLUDED_SCORE + scores, scores
+            )
+        return scores
+
+    def best_residence_location(self):
+        return best_location(self.grid, self.residence_scores())
+
+    def best_utility_location(self, building_name):
+        return best_location(self.grid, self.utility_scores(building_name))
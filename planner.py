@@ -0,0 +1,226 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from constants import *
+from game_layer import Action
+from game_state import BlueprintResidenceBuilding
+from logic import (
+    best_residence_location,
+    best_utility_location,
+    calculate_energy_need,
+    maintenance_target,
+    regulation_target,
+)
+from simulator import SimGame
+
+# Beam search over short action sequences, played on the simulator from the
+# current state. Every sequence is followed by rollout_policy for the rest of
+# the horizon and ranked by the final score projected from its last tick. Only the first
+# action of the best sequence is played, the search restarts every turn.
+
+DEPTH = 2  # Actions per planned sequence
+WIDTH = 3  # Sequences kept per depth
+HORIZON = 60  # Ticks simulated per sequence, including its actions
+BUDGET = 0.5  # Seconds per turn, no new depth is started after it
+
+
+class Planner:
+    def __init__(
+        self,
+        depth: int = DEPTH,
+        width: int = WIDTH,
+        horizon: int = HORIZON,
+        budget: float = BUDGET,
+        workers: int = 0,
+    ):
+        """
+        :param workers: int - processes running the rollouts, 0 to run them
+        in this process
+        """
+        self.depth = depth
+        self.width = width
+        self.horizon = horizon
+        self.budget = budget
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers) if workers else None
+
+    def candidates(self, state) -> List[Action]:
+        """
+        The actions worth searching from a state, the same kinds main.strategy
+        chooses from.
+        :param state: GameState - the current game state
+        """
+        actions = [Action("wait")]
+        if state.residences:
+            table = state.residence_table()
+            i = maintenance_target(state, table)
+            if i is not None:
+                actions.append(
+                    Action("maintenance", ((int(table.x[i]), int(table.y[i])),))
+                )
+            target = regulation_target(state, table)
+            if target is not None:
+                i, energy = target
+                position = (int(table.x[i]), int(table.y[i]))
+                actions.append(Action("adjust_energy_level", (position, energy)))
+        building = state.scheduler.next_construction()
+        if building:
+            actions.append(Action("build", ((building.X, building.Y),)))
+
+        location = best_residence_location(state)
+        if location[0] >= 0:
+            for blueprint in state.available_residence_buildings:
+                if (
+                    blueprint.release_tick <= state.turn
+                    and state.funds - blueprint.cost >= FUNDS_MIN
+                ):
+                    actions.append(
+                        Action("place_foundation", (location, blueprint.building_name))
+                    )
+        for blueprint in state.available_utility_buildings:
+            if (
+                blueprint.release_tick <= state.turn
+                and state.funds - blueprint.cost > FUNDS_MIN
+            ):
+                location = best_utility_location(state, blueprint.building_name)
+                if location[0] >= 0:
+                    actions.append(
+                        Action("place_foundation", (location, blueprint.building_name))
+                    )
+
+        for upgrade in state.available_upgrades:
+            if state.funds - upgrade.cost <= FUNDS_MIN:
+                continue
+            residence = state.scheduler.first_missing([upgrade.name])
+            if residence:
+                position = (residence.X, residence.Y)
+                actions.append(Action("buy_upgrade", (position, upgrade.name)))
+        return actions
+
+    def plan(self, state, info: dict, values: dict) -> Action:
+        """
+        Searches for the best action within the time budget.
+        :param state: GameState - the current game state
+        :param info: dict - the game info, as returned by new_game
+        :param values: dict - the current state, as returned by the backend
+        :return: Action - the first action of the best sequence found
+        """
+        deadline = time.perf_counter() + self.budget
+        horizon = min(self.horizon, state.max_turns - state.turn)
+        candidates = self.candidates(state)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        beam = [()]
+        best = None
+        for _ in range(min(self.depth, horizon)):
+            sequences = [x + (action,) for x in beam for action in candidates]
+            ranked = sorted(
+                zip(self._evaluate(info, values, sequences, horizon), sequences),
+                key=lambda x: x[0],
+                reverse=True,
+            )
+            best = ranked[0][1]
+            beam = [x for _, x in ranked[: self.width]]
+            if time.perf_counter() > deadline:
+                break
+        return best[0]
+
+    def _evaluate(self, info, values, sequences, horizon):
+        if self.pool is None:
+            return [rollout(info, values, x, horizon) for x in sequences]
+        chunksize = max(1, len(sequences) // (4 * self.workers))
+        return list(
+            self.pool.map(
+                rollout,
+                *zip(*((info, values, x, horizon) for x in sequences)),
+                chunksize=chunksize,
+            )
+        )
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+
+def rollout(info, values, sequence, horizon):
+    """Plays a sequence of actions on a simulator restored from values,
+    followed by rollout_policy until horizon ticks have passed
+
+    Args:
+        info (dict) - The game info
+        values (dict) - The game state to start from
+        sequence ((Action)) - The actions to play first
+        horizon (int) - Total number of ticks to simulate
+
+    Returns:
+        (float, float) - Projected final score and the funds at the end
+    """
+    game = SimGame.restore(info, values)
+    blueprints = {
+        x["buildingName"]: BlueprintResidenceBuilding(x)
+        for x in info["availableResidenceBuildings"]
+    }
+    for action in sequence:
+        game.act(*sim_args(action))
+    happiness, co2 = game.total_happiness, game.total_co2
+    for _ in range(horizon - len(sequence)):
+        happiness, co2 = game.total_happiness, game.total_co2
+        game.act(*rollout_policy(game, blueprints))
+    # The last tick's happiness and CO2 continue until the end of the game
+    ticks_left = game.max_turns - game.turn
+    return (
+        game.score()
+        + ticks_left
+        * (0.1 * (game.total_happiness - happiness) - (game.total_co2 - co2)),
+        game.funds,
+    )
+
+
+def rollout_policy(game, blueprints):
+    """The priorities of main.strategy without placing buildings: maintains
+    residences, buys Regulators, regulates energy and finishes construction,
+    otherwise waits
+
+    Args:
+        game (SimGame) - The simulated game
+        blueprints ({str: BlueprintResidenceBuilding}) - Residence blueprints
+        by name, for calculate_energy_need
+
+    Returns:
+        tuple - The arguments of SimGame.act
+    """
+    residences = [x for x in game.residences() if x.build_progress == 100]
+    for residence in residences:
+        if (
+            residence.health < HEALTH_MIN
+            and game.funds - residence.blueprint["maintenanceCost"] > FUNDS_MIN
+        ):
+            return "maintenance", residence.X, residence.Y
+    regulator = game.upgrade_values.get("Regulator")
+    if regulator and game.funds - regulator["cost"] > FUNDS_MIN:
+        for residence in residences:
+            if "Regulator" not in residence.upgrades:
+                return "buy_upgrade", residence.X, residence.Y, "Regulator"
+    if game.turn >= 2 and game.funds > FUNDS_MIN:
+        for residence in residences:
+            energy = calculate_energy_need(
+                game, residence, blueprints[residence.blueprint["buildingName"]]
+            )
+            if abs(energy - residence.requested_energy_in) >= ENERGY_DIFF_LIMIT:
+                return "adjust_energy", residence.X, residence.Y, energy
+    for building in game.buildings.values():
+        if building.build_progress < 100:
+            return "build", building.X, building.Y
+    return ("wait",)
+
+
+def sim_args(action):
+    """Translates a GameLayer action to the arguments of SimGame.act"""
+    if action.name == "wait":
+        return ("wait",)
+    (x, y), *args = action.args
+    if action.name == "adjust_energy_level":
+        return ("adjust_energy", x, y, *args)
+    return (action.name, x, y, *args)
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from game_state import GameState
+
+# Creates and starts the next game on a worker thread during the last turns
+# of the current one, so the next game's first decision doesn't wait for
+# new_game, start_game and parsing the map. The worker thread gets its own
+# keep-alive session from the HttpTransport.
+
+PREFETCH_TURNS = 10  # Turns left in the current game when the next is created
+
+
+class PrefetchedGame(NamedTuple):
+    map_name: str
+    seed: int
+    info: dict  # As returned by new_game
+    game_state: GameState  # Updated with the started state
+    state_values: dict  # As returned by start_game
+
+
+class Prefetcher:
+    def __init__(self, game_layer, turns: int = PREFETCH_TURNS):
+        """
+        :param turns: int - turns left in the current game when prefetch
+        starts creating the next
+        """
+        self.game_layer = game_layer
+        self.turns = turns
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.key = None  # (map name, seed) of the game being prefetched
+
+    def prefetch(self, map_name: str, seed: int = None):
+        """
+        Starts creating the next game, unless one is already prefetched.
+        Seeded games aren't prefetched: the next game of a seeded run has
+        another seed, and a backend deriving the game from its seed could
+        replace the game still being played.
+        """
+        if self.future is None and seed is None:
+            self.key = (map_name, seed)
+            self.future = self.executor.submit(
+                _fetch,
+                self.game_layer.backend,
+                self.game_layer.api_key,
+                map_name,
+                seed,
+            )
+
+    def take(self, map_name: str, seed: int = None) -> PrefetchedGame:
+        """
+        Returns the prefetched game, waiting for it if it isn't ready yet.
+        A game prefetched for another map or seed is ended.
+        :return: PrefetchedGame - None if no matching game was prefetched or
+        creating it failed
+        """
+        future, self.future = self.future, None
+        game = _result(future)
+        if game is None or self.key == (map_name, seed):
+            return game
+        self._end(game)
+        return None
+
+    def close(self):
+        """Ends a prefetched game that was never taken, e.g. when main stops"""
+        future, self.future = self.future, None
+        game = _result(future)
+        if game is not None:
+            self._end(game)
+
+    def _end(self, game):
+        self.game_layer.backend.end_game(
+            self.game_layer.api_key, game.game_state.game_id
+        )
+
+
+def _result(future):
+    if future is None or future.exception() is not None:
+        return None
+    return future.result()
+
+
+def _fetch(backend, api_key, map_name, seed):
+    game_options = {"mapName": map_name}
+    if seed is not None:
+        game_options["seed"] = seed
+    info = backend.new_game(api_key, game_options)
+    if info is None:
+        return None
+    game_state = GameState(info)
+    state_values = backend.start_game(api_key, game_state.game_id)
+    if state_values is None:
+        return None
+    game_state.update_state(state_values)
+    return PrefetchedGame(map_name, seed, info, game_state, state_values)
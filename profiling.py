@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# Per-turn timers for the hot paths of a game. Disabled timers cost one global
+# lookup and return a shared no-op context manager. Only the thread that
+# enabled profiling is timed, e.g. not the prefetch.py worker.
+#
+#   with profiling.timer("update_state"):
+#       ...
+#
+#   @profiling.timed("best_residence_location")
+#   def best_residence_location(state):
+#       ...
+
+PROFILE_DIR = "profiles"
+
+_NULL = nullcontext()
+_profile = None  # The Profile being recorded, None when disabled
+
+
+class Profile:
+    """Every timed phase of one game as (turn, phase, start, seconds, self
+    seconds) records. Self seconds exclude the time of nested timers.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.thread = threading.get_ident()  # The timed thread
+        self.turn = 0
+        self.records = []
+        self.stack = []  # Time spent in nested timers, per open timer
+
+    def summary(self):
+        """
+        :return: {str: (int, float, float)} - count, total and self seconds
+        per phase, the slowest phases first
+        """
+        phases = {}
+        for _, phase, _, seconds, self_seconds in self.records:
+            count, total, self_total = phases.get(phase, (0, 0, 0))
+            phases[phase] = (count + 1, total + seconds, self_total + self_seconds)
+        return dict(sorted(phases.items(), key=lambda x: x[1][2], reverse=True))
+
+
+class _Timer:
+    __slots__ = ("profile", "phase", "start")
+
+    def __init__(self, profile, phase):
+        self.profile = profile
+        self.phase = phase
+
+    def __enter__(self):
+        self.profile.stack.append(0)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        profile = self.profile
+        nested = profile.stack.pop()
+        if profile.stack:
+            profile.stack[-1] += seconds
+        profile.records.append(
+            (
+                profile.turn,
+                self.phase,
+                self.start - profile.start,
+                seconds,
+                seconds - nested,
+            )
+        )
+
+
+def enable():
+    """Starts recording a new Profile"""
+    global _profile
+    _profile = Profile()
+
+
+def disable():
+    global _profile
+    _profile = None
+
+
+def enabled():
+    return _profile is not None
+
+
+def profile():
+    """The Profile being recorded, None when disabled"""
+    return _profile
+
+
+def new_turn(turn):
+    """Attributes the following records to turn"""
+    if _profile is not None:
+        _profile.turn = turn
+
+
+def timer(phase):
+    """Context manager recording the time spent in phase"""
+    if _profile is None or threading.get_ident() != _profile.thread:
+        return _NULL
+    return _Timer(_profile, phase)
+
+
+def timed(phase):
+    """Decorator recording the time spent in the function as phase"""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profile is None or threading.get_ident() != _profile.thread:
+                return function(*args, **kwargs)
+            with _Timer(_profile, phase):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def print_summary():
+    if _profile is None:
+        return
+    turns = max(_profile.turn, 1)
+    print("Phase: count, total s, self s, self ms/turn")
+    for phase, (count, total, self_total) in _profile.summary().items():
+        print(
+            f"  {phase}: {count}, {total:.3f}, {self_total:.3f}, "
+            f"{1000 * self_total / turns:.3f}"
+        )
+
+
+def dump(game_id, directory=PROFILE_DIR):
+    """Writes the records of the current Profile to directory/game_id.json
+
+    Returns:
+        str - The path of the trace file, None when disabled
+    """
+    if _profile is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, game_id + ".json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "summary": _profile.summary(),
+                "fields": ["turn", "phase", "start", "seconds", "self_seconds"],
+                "records": _profile.records,
+            },
+            f,
+        )
+    return path
@@ -0,0 +1,35 @@
+import argparse
+
+import api
+import main
+from game_layer import GameLayer
+from transport import REPLAY_DIR, ReplayTransport
+
+
+def replay(game_id, directory=REPLAY_DIR):
+    """Replays a recorded game through main.strategy without network. Raises
+    transport.ReplayMismatch as soon as the strategy decides differently than
+    in the recorded game.
+
+    Args:
+        game_id (str) - Id of the recorded game
+        directory (str) - Directory holding the recordings
+
+    Returns:
+        int - The final score
+    """
+    transport = ReplayTransport(game_id, directory)
+    api.transport = transport
+    # With PREDICT this measures the forward model against the recorded server
+    main.GAME_LAYER = main.configure(GameLayer(main.API_KEY, api))
+    # There is no network to overlap, and the log holds only this game
+    main.GAME_LAYER.prefetcher = None
+    return main.main(transport.map_name, log_score=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded game")
+    parser.add_argument("game_id")
+    parser.add_argument("-d", "--dir", default=REPLAY_DIR)
+    args = parser.parse_args()
+    replay(args.game_id, args.dir)
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class ResidenceTable:
+    """The residences of a GameState as NumPy columns, row i being
+    state.residences[i]. Blueprint values are joined in per row and effects
+    are stored as a bitmask, see has_effect.
+    """
+
+    def __init__(self, state):
+        residences = state.residences
+        n = len(residences)
+        self.size: int = n
+        self.x = np.fromiter((r.X for r in residences), int, n)
+        self.y = np.fromiter((r.Y for r in residences), int, n)
+        self.pop = np.fromiter((r.current_pop for r in residences), float, n)
+        self.temperature = np.fromiter((r.temperature for r in residences), float, n)
+        self.requested_energy = np.fromiter(
+            (r.requested_energy_in for r in residences), float, n
+        )
+        self.health = np.fromiter((r.health for r in residences), float, n)
+        self.happiness = np.fromiter(
+            (r.happiness_per_tick_per_pop for r in residences), float, n
+        )
+        self.build_progress = np.fromiter(
+            (r.build_progress for r in residences), int, n
+        )
+
+        self.effect_bits = {
+            name: 1 << i for i, name in enumerate(state.effects_by_name)
+        }
+        self.effects = np.fromiter(
+            (
+                sum(self.effect_bits.get(name, 0) for name in set(r.effects))
+                for r in residences
+            ),
+            np.int64,
+            n,
+        )
+
+        blueprints = [state.residence_blueprints[r.building_name] for r in residences]
+        self.base_energy_need = np.fromiter(
+            (b.base_energy_need for b in blueprints), float, n
+        )
+        self.emissivity = np.fromiter((b.emissivity for b in blueprints), float, n)
+        self.maintenance_cost = np.fromiter(
+            (b.maintenance_cost for b in blueprints), float, n
+        )
+        self.max_happiness = np.fromiter(
+            (b.max_happiness for b in blueprints), float, n
+        )
+
+    def has_effect(self, name):
+        """Boolean column, True for residences with the named effect"""
+        return (self.effects & self.effect_bits.get(name, 0)) != 0
@@ -0,0 +1,243 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import subprocess
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import constants
+
+# Final scores of every played game in an indexed SQLite database, replacing
+# the <map>.txt logs. Old logs are imported once with:
+#
+#   python results.py import games/*.txt
+#   python results.py report London Kiruna
+#   python results.py trend London
+
+RESULTS_PATH = "results.db"
+
+# The constants recorded with every game, the ones tune.py searches
+PARAMS = (
+    "ENERGY_DIFF_LIMIT",
+    "FUNDS_MIN",
+    "FUNDS_MED",
+    "HEALTH_MIN",
+    "QUEUE_HAPPINESS_MAX",
+    "UTILITY_INTERVAL",
+    "WINDTURBINE_RESIDENCES",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    map TEXT NOT NULL,
+    played_at REAL NOT NULL,
+    final_score INTEGER NOT NULL,
+    final_population INTEGER,
+    total_happiness REAL,
+    co2 REAL,
+    backend TEXT,
+    version TEXT,
+    params TEXT
+);
+CREATE INDEX IF NOT EXISTS games_map_score ON games (map, final_score);
+CREATE INDEX IF NOT EXISTS games_map_played_at ON games (map, played_at);
+"""
+
+
+@lru_cache(maxsize=1)
+def code_version():
+    """The commit being played, None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def strategy_params():
+    """The current values of PARAMS, including the ones tune.py applied"""
+    return {name: getattr(constants, name) for name in PARAMS}
+
+
+class ResultsStore:
+    def __init__(self, path: str = RESULTS_PATH):
+        # Runner workers write concurrently, wait for each other's locks
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def add(
+        self,
+        game_id: str,
+        game_map: str,
+        score: dict,
+        backend: str = None,
+        params: dict = None,
+        version: str = None,
+        played_at: float = None,
+    ):
+        """
+        Records one game, replacing an earlier record of the same game id.
+        :param score: dict - the response of get_score, finalScore is required
+        :param params: dict - the strategy parameters, None if unknown
+        :param version: string - the commit the game was played with
+        :param played_at: float - unix time the game ended, defaults to now
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    game_id,
+                    game_map,
+                    time.time() if played_at is None else played_at,
+                    score["finalScore"],
+                    score.get("finalPopulation"),
+                    score.get("totalHappiness"),
+                    score.get("co2"),
+                    backend,
+                    version,
+                    None if params is None else json.dumps(params, sort_keys=True),
+                ),
+            )
+
+    def maps(self):
+        return [x for x, in self.connection.execute("SELECT DISTINCT map FROM games")]
+
+    def best(self, game_map: str):
+        """
+        :return: (str, int, float, dict) - game id, final score, played at and
+        params of the best game on game_map, None if there are no games
+        """
+        row = self.connection.execute(
+            "SELECT game_id, final_score, played_at, params FROM games"
+            " WHERE map = ? ORDER BY final_score DESC LIMIT 1",
+            (game_map,),
+        ).fetchone()
+        if row is None:
+            return None
+        game_id, final_score, played_at, params = row
+        return game_id, final_score, played_at, params and json.loads(params)
+
+    def summary(self, game_map: str):
+        """
+        :return: (int, float, int, int) - count, mean, min and max final score
+        """
+        return self.connection.execute(
+            "SELECT COUNT(*), AVG(final_score), MIN(final_score), MAX(final_score)"
+            " FROM games WHERE map = ?",
+            (game_map,),
+        ).fetchone()
+
+    def percentiles(self, game_map: str, percents=(10, 50, 90)):
+        """
+        Nearest rank percentiles of the final scores, read from the index.
+        :return: {int: int} - final score per percent, empty if there are no games
+        """
+        (count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM games WHERE map = ?", (game_map,)
+        ).fetchone()
+        if not count:
+            return {}
+        values = {}
+        for percent in percents:
+            rank = max(0, min(count - 1, -(-percent * count // 100) - 1))
+            (values[percent],) = self.connection.execute(
+                "SELECT final_score FROM games WHERE map = ?"
+                " ORDER BY final_score LIMIT 1 OFFSET ?",
+                (game_map, rank),
+            ).fetchone()
+        return values
+
+    def trend(self, game_map: str, period: str = "%Y-%m-%d"):
+        """
+        :param period: string - strftime format the games are grouped by,
+        e.g. "%Y-%m-%d %H" for hours
+        :return: [(str, int, float, int)] - period, count, mean and max final
+        score, oldest first
+        """
+        return self.connection.execute(
+            "SELECT strftime(?, played_at, 'unixepoch', 'localtime') AS period,"
+            " COUNT(*), AVG(final_score), MAX(final_score)"
+            " FROM games WHERE map = ? GROUP BY period ORDER BY period",
+            (period, game_map),
+        ).fetchall()
+
+    def import_log(self, path: str):
+        """
+        Imports a <map>.txt log of "<date> <time>: <map>, <score>, <game id>"
+        lines, skipping the others. Their score breakdown, params and version
+        are unknown.
+        :return: int - the number of imported games
+        """
+        rows = []
+        with open(path) as f:
+            for line in f:
+                if ": " not in line:  # Blank and "--------" separator lines
+                    continue
+                played_at, fields = line.rsplit(": ", 1)
+                game_map, final_score, game_id = (x.strip() for x in fields.split(","))
+                played_at = datetime.strptime(played_at, "%Y-%m-%d %H:%M:%S")
+                rows.append(
+                    (game_id, game_map, played_at.timestamp(), int(final_score))
+                )
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO games (game_id, map, played_at, final_score)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def close(self):
+        self.connection.close()
+
+
+def report(store, maps):
+    """Prints count, mean, percentiles and best game per map"""
+    print(
+        f"{'Map':<12}{'Games':>7}{'Mean':>9}{'P10':>8}{'P50':>8}{'P90':>8}"
+        f"{'Best':>8}  Best game"
+    )
+    for game_map in maps:
+        count, mean, _, _ = store.summary(game_map)
+        if not count:
+            print(f"{game_map:<12}{0:>7}")
+            continue
+        p = store.percentiles(game_map)
+        best_id, best, _, _ = store.best(game_map)
+        print(
+            f"{game_map:<12}{count:>7}{mean:>9.0f}{p[10]:>8}{p[50]:>8}{p[90]:>8}"
+            f"{best:>8}  {best_id}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the game results")
+    parser.add_argument("--db", default=RESULTS_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report").add_argument("maps", nargs="*")
+    trend = commands.add_parser("trend")
+    trend.add_argument("map")
+    trend.add_argument("--period", default="%Y-%m-%d")
+    commands.add_parser("import").add_argument("paths", nargs="*")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == "report":
+        report(store, args.maps or store.maps())
+    elif args.command == "trend":
+        for period, count, mean, best in store.trend(args.map, args.period):
+            print(f"{period}: {count} games, mean {mean:.0f}, best {best}")
+    else:
+        for path in args.paths or glob.glob("games/*.txt"):
+            print(f"{path}: {store.import_log(path)} games")
+    store.close()
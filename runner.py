@@ -0,0 +1,86 @@
+import argparse
+import os
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import main
+from game_layer import GameLayer, get_backend
+
+MAPS = ["training1", "training2", "Gothenburg", "Kiruna", "Visby", "London"]
+
+
+def init_worker(backend, verbose):
+    """Gives every worker process its own GameLayer on the chosen backend"""
+    main.GAME_LAYER = main.configure(GameLayer(main.API_KEY, get_backend(backend)))
+    main.VERBOSE = False
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+
+def play(game_map):
+    """Plays one game in a worker process
+
+    Returns:
+        (str, str, int) - The map, game id and final score
+    """
+    final_score = main.main(game_map)
+    return game_map, main.GAME_LAYER.game_state.game_id, final_score
+
+
+def run(maps, games, backend="remote", workers=None, verbose=False):
+    """Plays games on every map concurrently on a process pool
+
+    Args:
+        maps ([str]) - The map names
+        games (int) - Number of games per map
+        backend (str) - "remote" or "local", see game_layer.BACKENDS
+        workers (int) - Number of processes, defaults to the number of cores
+        verbose (bool) - Let the games print their progress
+
+    Returns:
+        {str: [(str, int)]} - (game id, final score) of every finished game per map
+    """
+    results = {x: [] for x in maps}
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=init_worker,
+        initargs=(backend, verbose),
+    ) as pool:
+        futures = [pool.submit(play, x) for _ in range(games) for x in maps]
+        for future in as_completed(futures):
+            try:
+                game_map, game_id, final_score = future.result()
+            except Exception as e:
+                print("Game failed: " + str(e))
+                continue
+            if final_score is not None:
+                results[game_map].append((game_id, final_score))
+    return results
+
+
+def summarize(results):
+    """Prints mean, standard deviation and best game per map"""
+    print(f"{'Map':<12}{'Games':>6}{'Mean':>10}{'Stdev':>10}{'Best':>8}  Best game")
+    for game_map, scores in results.items():
+        if not scores:
+            print(f"{game_map:<12}{0:>6}")
+            continue
+        values = [x[1] for x in scores]
+        best_id, best = max(scores, key=lambda x: x[1])
+        stdev = statistics.stdev(values) if len(values) > 1 else 0
+        print(
+            f"{game_map:<12}{len(values):>6}{statistics.mean(values):>10.0f}"
+            f"{stdev:>10.0f}{best:>8}  {best_id}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games in parallel")
+    parser.add_argument("maps", nargs="*", default=MAPS)
+    parser.add_argument("-n", "--games", type=int, default=1, help="games per map")
+    parser.add_argument("-b", "--backend", default=main.BACKEND)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    summarize(run(args.maps, args.games, args.backend, args.workers, args.verbose))
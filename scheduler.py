@@ -0,0 +1,90 @@
+import heapq
+import itertools
+from typing import Dict, Iterable, List, Tuple
+
+# The pending work of a game, kept in heaps instead of found by scanning every
+# building each turn. Buildings are numbered in the order they first appear,
+# which is their order in the state's building lists, so the heaps pick the
+# same building a scan of the lists would.
+
+
+class Scheduler:
+    """Buildings under construction and finished residences missing an
+    upgrade, updated from the new and removed buildings of every state
+    update, see update. Stale heap entries are dropped when they reach the
+    top.
+    """
+
+    def __init__(self, utility_blueprints):
+        self.utility_blueprints = utility_blueprints
+        self.sequence = itertools.count()
+        self.numbers: Dict[Tuple[int, int], int] = {}  # By (X, Y)
+        # (residences first, number, building) of unfinished buildings
+        self.construction: List[tuple] = []
+        self.unfinished: Dict[int, object] = {}  # By number
+        self.finished: Dict[int, object] = {}  # Finished residences by number
+        # (number, residence) per upgrade name, built on the first query
+        self.missing: Dict[str, List[tuple]] = {}
+
+    def update(self, changes):
+        """
+        Numbers the new buildings and moves the residences finished since the
+        last update to the upgrade heaps.
+        :param changes: StateChanges - the changes of the update
+        """
+        for building in changes.removed:
+            number = self.numbers.pop((building.X, building.Y), None)
+            self.unfinished.pop(number, None)
+            self.finished.pop(number, None)
+        for building in changes.new:
+            number = next(self.sequence)
+            self.numbers[(building.X, building.Y)] = number
+            if building.build_progress < 100:
+                is_utility = building.building_name in self.utility_blueprints
+                heapq.heappush(self.construction, (is_utility, number, building))
+                self.unfinished[number] = building
+            elif building.building_name not in self.utility_blueprints:
+                self._finish(number, building)
+        for number, building in list(self.unfinished.items()):
+            if building.build_progress == 100:
+                del self.unfinished[number]
+                if building.building_name not in self.utility_blueprints:
+                    self._finish(number, building)
+
+    def _finish(self, number, residence):
+        self.finished[number] = residence
+        for heap in self.missing.values():
+            heapq.heappush(heap, (number, residence))
+
+    def next_construction(self):
+        """The first unfinished residence, or else the first unfinished
+        utility, None if every building is finished. O(log n).
+        """
+        heap = self.construction
+        while heap:
+            _, number, building = heap[0]
+            if number in self.unfinished:
+                return building
+            heapq.heappop(heap)
+        return None
+
+    def first_missing(self, upgrade_names: Iterable[str]):
+        """
+        The first finished residence that is missing one of the upgrades,
+        O(log n) per upgrade.
+        :param upgrade_names: [str] - the upgrade names, e.g. ["Regulator"]
+        :return: Residence - None if every residence has all of them
+        """
+        first = None
+        for name in upgrade_names:
+            heap = self.missing.get(name)
+            if heap is None:
+                heap = self.missing[name] = sorted(self.finished.items())
+            # Upgrades are never lost, entries that have one are dropped for good
+            while heap and (
+                heap[0][0] not in self.finished or name in heap[0][1].effects
+            ):
+                heapq.heappop(heap)
+            if heap and (first is None or heap[0][0] < first[0]):
+                first = heap[0]
+        return first and first[1]
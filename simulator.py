@@ -0,0 +1,654 @@
+import math
+import random
+import uuid
+
+from constants import *
+
+# In-process approximation of the game server. Implements the same functions
+# as api.py and returns the same JSON shapes, so GameLayer can use it as a
+# backend. The rules follow considition.com/rules, but the numbers below are
+# estimates tuned to give scores in the same range as the real maps.
+
+## -- Simulator constants -- ##
+START_FUNDS = 40000
+START_QUEUE = 15
+QUEUE_GROWTH = 1  # People joining the housing queue per tick
+MOVE_IN_PER_TICK = 4
+COMFORT_TEMP_MIN = 18
+COMFORT_TEMP_MAX = 24
+REGULATOR_TEMP_MIN = 19
+REGULATOR_TEMP_MAX = 23
+MOVE_OUT_TEMP_MIN = 12
+MOVE_OUT_TEMP_MAX = 30
+HEALTH_HAPPY = 40  # Happiness drops linearly below this health
+MAX_GAMES = 64  # Finished games kept in memory
+
+MAPS = {
+    "training0": {"size": 10, "maxTurns": 700, "minTemp": -5, "maxTemp": 20},
+    "training1": {"size": 10, "maxTurns": 700, "minTemp": -5, "maxTemp": 20},
+    "training2": {"size": 10, "maxTurns": 700, "minTemp": 5, "maxTemp": 25},
+    "Gothenburg": {"size": 10, "maxTurns": 700, "minTemp": -2, "maxTemp": 22},
+    "Kiruna": {"size": 10, "maxTurns": 700, "minTemp": -20, "maxTemp": 14},
+    "Visby": {"size": 10, "maxTurns": 700, "minTemp": 0, "maxTemp": 25},
+    "London": {"size": 14, "maxTurns": 700, "minTemp": 2, "maxTemp": 23},
+}
+TREE_DENSITY = 0.15
+
+ENERGY_LEVELS = [
+    {"energyThreshold": 0, "costPerMwh": 4, "tonCo2PerMwh": 0.1},
+    {"energyThreshold": 60, "costPerMwh": 6, "tonCo2PerMwh": 0.15},
+    {"energyThreshold": 120, "costPerMwh": 9, "tonCo2PerMwh": 0.25},
+]
+
+
+def _residence(
+    name,
+    cost,
+    co2,
+    energy,
+    speed,
+    pop,
+    income,
+    emissivity,
+    maint,
+    decay,
+    happiness,
+    release=0,
+):
+    return {
+        "buildingName": name,
+        "cost": cost,
+        "co2Cost": co2,
+        "baseEnergyNeed": energy,
+        "buildSpeed": speed,
+        "type": "Residence",
+        "releaseTick": release,
+        "maxPop": pop,
+        "incomePerPop": income,
+        "emissivity": emissivity,
+        "maintenanceCost": maint,
+        "decayRate": decay,
+        "maxHappiness": happiness,
+    }
+
+
+def _utility(name, cost, co2, speed, effects, queue_increase, release=0):
+    return {
+        "buildingName": name,
+        "cost": cost,
+        "co2Cost": co2,
+        "baseEnergyNeed": 0,
+        "buildSpeed": speed,
+        "type": "Utility",
+        "releaseTick": release,
+        "effects": effects,
+        "queueIncrease": queue_increase,
+    }
+
+
+def _effect(
+    name,
+    radius=0,
+    emissivity=1,
+    decay=1,
+    income=0,
+    happiness=0,
+    mwh=0,
+    energy=0,
+    co2_per_pop=0,
+    decay_increase=0,
+):
+    return {
+        "name": name,
+        "radius": radius,
+        "emissivityMultiplier": emissivity,
+        "decayMultiplier": decay,
+        "buildingIncomeIncrease": income,
+        "maxHappinessIncrease": happiness,
+        "mwhProduction": mwh,
+        "baseEnergyMwhIncrease": energy,
+        "co2PerPopIncrease": co2_per_pop,
+        "decayIncrease": decay_increase,
+    }
+
+
+RESIDENCE_BUILDINGS = [
+    _residence("Apartments", 4800, 400, 2.1, 20, 54, 1.6, 0.45, 700, 0.12, 0.5),
+    _residence("ModernApartments", 7300, 600, 2.8, 12, 65, 1.8, 0.3, 800, 0.1, 0.7),
+    _residence("Cabin", 3200, 100, 1.4, 40, 10, 2, 0.8, 300, 0.2, 1.5),
+    _residence(
+        "EnvironmentalHouse", 5700, 50, 1.8, 16, 15, 1.9, 0.15, 400, 0.1, 1.2, 50
+    ),
+    _residence("HighRise", 14000, 1300, 5.2, 8, 150, 1.3, 0.4, 1600, 0.15, 0.5, 100),
+    _residence(
+        "LuxuryResidence", 8500, 800, 3.5, 15, 35, 3.8, 0.25, 1200, 0.08, 2, 150
+    ),
+]
+
+UTILITY_BUILDINGS = [
+    _utility("Park", 2500, 0, 25, ["Park"], 0),
+    _utility("Mall", 8400, 200, 10, ["Mall"], 0.5),
+    _utility("WindTurbine", 6000, 0, 12, ["WindTurbine"], 0),
+]
+
+UPGRADES = [
+    {"name": "Caretaker", "effect": "Caretaker", "cost": 3500},
+    {"name": "SolarPanel", "effect": "SolarPanel", "cost": 6800},
+    {"name": "Insulation", "effect": "Insulation", "cost": 7200},
+    {"name": "Playground", "effect": "Playground", "cost": 5200},
+    {"name": "Charger", "effect": "Charger", "cost": 3400},
+    {"name": "Regulator", "effect": "Regulator", "cost": 1250},
+]
+
+EFFECTS = [
+    _effect("Park", radius=2, happiness=0.2, co2_per_pop=-0.007),
+    _effect("Mall", radius=3, income=1, happiness=0.3),
+    _effect("WindTurbine", radius=2, mwh=3.4),
+    _effect("Caretaker", decay=0.5),
+    _effect("SolarPanel", mwh=1),
+    _effect("Insulation", emissivity=0.6),
+    _effect("Playground", happiness=0.2),
+    _effect("Charger", income=1.5, happiness=0.16, energy=1.8),
+    _effect("Regulator"),
+]
+## ---- ##
+
+games = {}
+last_game_id = None
+
+
+def generate_map_info(map_name, seed=None):
+    """Creates the game info of a new local game, same shape as api.new_game
+
+    Args:
+        map_name (str) - One of MAPS, unknown names fall back to training1
+        seed (int) - Seed for the map layout, the game id is always unique
+
+    Returns:
+        dict - The game info
+    """
+    rng = random.Random(seed)
+    params = MAPS.get(map_name, MAPS["training1"])
+    size = params["size"]
+    return {
+        "gameId": str(uuid.uuid4()),
+        "mapName": map_name,
+        "maxTurns": params["maxTurns"],
+        "maxTemp": params["maxTemp"],
+        "minTemp": params["minTemp"],
+        "map": [
+            [
+                POS_TREE if rng.random() < TREE_DENSITY else POS_EMPTY
+                for _ in range(size)
+            ]
+            for _ in range(size)
+        ],
+        "energyLevels": [dict(x) for x in ENERGY_LEVELS],
+        "availableResidenceBuildings": [dict(x) for x in RESIDENCE_BUILDINGS],
+        "availableUtilityBuildings": [
+            dict(x, effects=list(x["effects"])) for x in UTILITY_BUILDINGS
+        ],
+        "availableUpgrades": [dict(x) for x in UPGRADES],
+        "effects": [dict(x) for x in EFFECTS],
+    }
+
+
+def copy_info(info):
+    """Copies game info so the client can't mutate the simulator's map"""
+    info = dict(info)
+    info["map"] = [list(row) for row in info["map"]]
+    return info
+
+
+class SimBuilding:
+    def __init__(self, blueprint, x, y):
+        self.blueprint = blueprint
+        self.X = x
+        self.Y = y
+        self.build_progress = 0
+        self.upgrades = []
+        self.effects = []
+        self.effective_energy_in = 0
+        self.requested_energy_in = blueprint["baseEnergyNeed"]
+        self.current_pop = 0
+        self.temperature = OPT_TEMP
+        self.happiness_per_tick_per_pop = 0
+        self.health = 100
+
+    def json(self):
+        values = {
+            "buildingName": self.blueprint["buildingName"],
+            "position": {"x": self.X, "y": self.Y},
+            "effectiveEnergyIn": self.effective_energy_in,
+            "buildProgress": self.build_progress,
+            "canBeDemolished": True,
+            "effects": list(self.effects),
+        }
+        if self.blueprint["type"] == "Residence":
+            values["currentPop"] = self.current_pop
+            values["temperature"] = self.temperature
+            values["requestedEnergyIn"] = self.requested_energy_in
+            values["happinessPerTickPerPop"] = self.happiness_per_tick_per_pop
+            values["health"] = self.health
+        return values
+
+
+class SimGame:
+    def __init__(self, info):
+        self.info = info
+        self.game_id = info["gameId"]
+        self.max_turns = info["maxTurns"]
+        self.map = info["map"]
+        self.blueprints = {
+            x["buildingName"]: x
+            for x in info["availableResidenceBuildings"]
+            + info["availableUtilityBuildings"]
+        }
+        self.effect_values = {x["name"]: x for x in info["effects"]}
+        self.upgrade_values = {x["name"]: x for x in info["availableUpgrades"]}
+        self.energy_levels = sorted(
+            info["energyLevels"], key=lambda x: x["energyThreshold"]
+        )
+
+        self.turn = 0
+        self.funds = START_FUNDS
+        self.total_co2 = 0
+        self.total_happiness = 0
+        self.current_temp = self.outdoor_temp(0)
+        self.queue_happiness = 0
+        self.housing_queue = START_QUEUE
+        self.buildings = {}  # (x, y) -> SimBuilding
+        self.errors = []
+        self.messages = []
+
+    @classmethod
+    def restore(cls, info, state):
+        """Creates a game continuing from a state returned by any backend
+
+        Args:
+            info (dict) - The game info, as returned by new_game
+            state (dict) - The game state, as returned by an action
+
+        Returns:
+            SimGame - The game
+        """
+        game = cls(info)
+        game.turn = state["turn"]
+        game.funds = state["funds"]
+        game.total_co2 = state["totalCo2"]
+        game.total_happiness = state["totalHappiness"]
+        game.current_temp = state["currentTemp"]
+        game.queue_happiness = state["queueHappiness"]
+        game.housing_queue = state["housingQueue"]
+        upgrades = {x["effect"] for x in game.upgrade_values.values()}
+        for values in state["residenceBuildings"] + state["utilityBuildings"]:
+            position = values["position"]
+            building = SimBuilding(
+                game.blueprints[values["buildingName"]], position["x"], position["y"]
+            )
+            building.build_progress = values["buildProgress"]
+            building.effects = list(values["effects"])
+            building.upgrades = [x for x in building.effects if x in upgrades]
+            building.effective_energy_in = values["effectiveEnergyIn"]
+            if "currentPop" in values:
+                building.current_pop = values["currentPop"]
+                building.temperature = values["temperature"]
+                building.requested_energy_in = values["requestedEnergyIn"]
+                building.happiness_per_tick_per_pop = values["happinessPerTickPerPop"]
+                building.health = values["health"]
+            game.buildings[(building.X, building.Y)] = building
+        return game
+
+    def outdoor_temp(self, turn):
+        """One sine period from the coldest to the coldest day over the game"""
+        low, high = self.info["minTemp"], self.info["maxTemp"]
+        phase = 2 * math.pi * turn / self.max_turns
+        return (high + low) / 2 - (high - low) / 2 * math.cos(phase)
+
+    def residences(self):
+        return [
+            x for x in self.buildings.values() if x.blueprint["type"] == "Residence"
+        ]
+
+    def utilities(self):
+        return [x for x in self.buildings.values() if x.blueprint["type"] == "Utility"]
+
+    def score(self):
+        pop = sum(x.current_pop for x in self.buildings.values())
+        return max(15 * pop + 0.1 * self.total_happiness - self.total_co2, 0)
+
+    def state(self):
+        return {
+            "turn": self.turn,
+            "funds": self.funds,
+            "totalCo2": self.total_co2,
+            "totalHappiness": self.total_happiness,
+            "currentTemp": self.current_temp,
+            "queueHappiness": self.queue_happiness,
+            "housingQueue": self.housing_queue,
+            "residenceBuildings": [x.json() for x in self.residences()],
+            "utilityBuildings": [x.json() for x in self.utilities()],
+            "errors": list(self.errors),
+            "messages": list(self.messages),
+        }
+
+    def act(self, action, *args):
+        """Performs one action and advances the game by one tick
+
+        Args:
+            action (str) - Name of a SimGame action method
+            args - The action arguments
+
+        Returns:
+            dict - The new game state
+        """
+        self.errors = []
+        self.messages = []
+        if self.turn >= self.max_turns:
+            self.errors.append("The game is over")
+            return self.state()
+        error = getattr(self, action)(*args)
+        if error:
+            self.errors.append(error)
+        self.tick()
+        return self.state()
+
+    def place_foundation(self, x, y, building_name):
+        blueprint = self.blueprints.get(building_name)
+        if blueprint is None:
+            return f"No building named {building_name}"
+        if not (0 <= x < len(self.map) and 0 <= y < len(self.map[x])):
+            return "Position is outside the map"
+        if self.map[x][y] != POS_EMPTY or (x, y) in self.buildings:
+            return "Position is occupied"
+        if blueprint["releaseTick"] > self.turn:
+            return f"{building_name} is not released yet"
+        if blueprint["cost"] > self.funds:
+            return "Not enough funds"
+        self.funds -= blueprint["cost"]
+        self.total_co2 += blueprint["co2Cost"]
+        self.buildings[(x, y)] = SimBuilding(blueprint, x, y)
+
+    def build(self, x, y):
+        building = self.buildings.get((x, y))
+        if building is None:
+            return "No building at position"
+        if building.build_progress >= 100:
+            return "Building is already completed"
+        building.build_progress = min(
+            building.build_progress + building.blueprint["buildSpeed"], 100
+        )
+        if building.build_progress == 100:
+            self.messages.append(f"{building.blueprint['buildingName']} completed")
+
+    def maintenance(self, x, y):
+        building = self.buildings.get((x, y))
+        if building is None or building.blueprint["type"] != "Residence":
+            return "No residence at position"
+        if building.blueprint["maintenanceCost"] > self.funds:
+            return "Not enough funds"
+        self.funds -= building.blueprint["maintenanceCost"]
+        building.health = 100
+
+    def demolish(self, x, y):
+        building = self.buildings.pop((x, y), None)
+        if building is None:
+            return "No building at position"
+        self.housing_queue += building.current_pop
+
+    def adjust_energy(self, x, y, value):
+        building = self.buildings.get((x, y))
+        if building is None or building.blueprint["type"] != "Residence":
+            return "No residence at position"
+        building.requested_energy_in = max(value, 0)
+
+    def buy_upgrade(self, x, y, upgrade_name):
+        building = self.buildings.get((x, y))
+        upgrade = self.upgrade_values.get(upgrade_name)
+        if building is None or building.blueprint["type"] != "Residence":
+            return "No residence at position"
+        if building.build_progress < 100:
+            return "Building is not completed"
+        if upgrade is None:
+            return f"No upgrade named {upgrade_name}"
+        if upgrade["effect"] in building.upgrades:
+            return "Upgrade already bought"
+        if upgrade["cost"] > self.funds:
+            return "Not enough funds"
+        self.funds -= upgrade["cost"]
+        building.upgrades.append(upgrade["effect"])
+
+    def wait(self):
+        pass
+
+    def _effects_in_range(self, residence, utilities):
+        effects = list(residence.upgrades)
+        for utility in utilities:
+            d = abs(utility.X - residence.X) + abs(utility.Y - residence.Y)
+            for name in utility.blueprint["effects"]:
+                if d <= self.effect_values[name]["radius"]:
+                    effects.append(name)
+        return effects
+
+    def tick(self):
+        """Advances the game by one tick. Per completed residence the indoor
+        temperature follows the energy_wanted formula from considition.com/rules,
+        happiness depends on comfort and health, and health decays.
+        """
+        self.turn += 1
+        self.current_temp = self.outdoor_temp(self.turn)
+        utilities = [x for x in self.utilities() if x.build_progress == 100]
+        queue_increase = sum(x.blueprint["queueIncrease"] for x in utilities)
+        self.queue_happiness = queue_increase
+        self.housing_queue += QUEUE_GROWTH + queue_increase
+
+        grid_energy = 0
+        for residence in self.residences():
+            if residence.build_progress < 100:
+                continue
+            blueprint = residence.blueprint
+            residence.effects = self._effects_in_range(residence, utilities)
+            effects = [self.effect_values[x] for x in residence.effects]
+
+            emissivity = blueprint["emissivity"]
+            decay = blueprint["decayRate"]
+            for effect in effects:
+                emissivity *= effect["emissivityMultiplier"]
+                decay *= effect["decayMultiplier"]
+            base_energy_need = blueprint["baseEnergyNeed"] + sum(
+                x["baseEnergyMwhIncrease"] for x in effects
+            )
+            decay += sum(x["decayIncrease"] for x in effects)
+            max_happiness = blueprint["maxHappiness"] + sum(
+                x["maxHappinessIncrease"] for x in effects
+            )
+            income = blueprint["incomePerPop"] + sum(
+                x["buildingIncomeIncrease"] for x in effects
+            )
+            co2_per_pop = CO2_PER_POP + sum(x["co2PerPopIncrease"] for x in effects)
+
+            residence.effective_energy_in = residence.requested_energy_in
+            grid_energy += max(
+                residence.effective_energy_in
+                - sum(x["mwhProduction"] for x in effects),
+                0,
+            )
+            residence.temperature += (
+                (residence.effective_energy_in - base_energy_need)
+                * DEGREES_PER_EXCESS_MWH
+                + DEGREES_PER_POP * residence.current_pop
+                - (residence.temperature - self.current_temp) * emissivity
+            )
+            if "Regulator" in residence.effects:
+                residence.temperature = min(
+                    max(residence.temperature, REGULATOR_TEMP_MIN), REGULATOR_TEMP_MAX
+                )
+
+            residence.health = max(residence.health - decay, 0)
+            if (
+                residence.health == 0
+                or not MOVE_OUT_TEMP_MIN <= residence.temperature <= MOVE_OUT_TEMP_MAX
+            ):
+                if residence.current_pop > 0:
+                    residence.current_pop -= 1
+            else:
+                moving_in = min(
+                    int(self.housing_queue),
+                    blueprint["maxPop"] - residence.current_pop,
+                    MOVE_IN_PER_TICK,
+                )
+                residence.current_pop += moving_in
+                self.housing_queue -= moving_in
+
+            comfort = (
+                1
+                if COMFORT_TEMP_MIN <= residence.temperature <= COMFORT_TEMP_MAX
+                else 0.5
+            )
+            residence.happiness_per_tick_per_pop = (
+                max_happiness * comfort * min(residence.health / HEALTH_HAPPY, 1)
+            )
+            self.total_happiness += (
+                residence.happiness_per_tick_per_pop * residence.current_pop
+            )
+            self.total_co2 += co2_per_pop * residence.current_pop
+            self.funds += income * residence.current_pop
+
+        level = self.energy_levels[0]
+        for x in self.energy_levels:
+            if grid_energy >= x["energyThreshold"]:
+                level = x
+        self.total_co2 += grid_energy * level["tonCo2PerMwh"]
+        self.funds -= grid_energy * level["costPerMwh"]
+
+
+def _game(game_id):
+    game = games.get(game_id or last_game_id)
+    if game is None:
+        print("Fatal Error: no local game with id " + str(game_id))
+    return game
+
+
+def sim_action(name, body=None):
+    """Translates an api.py action function and its request body to the
+    arguments of SimGame.act
+
+    Args:
+        name (str) - Name of the api.py function, e.g. "adjust_energy"
+        body (dict) - The request body
+
+    Returns:
+        tuple - The SimGame method name and its arguments
+    """
+    if name == "wait":
+        return ("wait",)
+    x, y = _position(body)
+    if name == "place_foundation":
+        return name, x, y, body["BuildingName"]
+    if name == "adjust_energy":
+        return name, x, y, body["value"]
+    if name == "buy_upgrades":
+        return "buy_upgrade", x, y, body["upgradeAction"]
+    return name, x, y
+
+
+def _position(values):
+    """Reads x and y from a request position regardless of key casing"""
+    position = {k.lower(): v for k, v in values.items()}
+    position = {k.lower(): v for k, v in position["position"].items()}
+    return position["x"], position["y"]
+
+
+def new_game(api_key, game_options=""):
+    global last_game_id
+    options = game_options or {}
+    info = generate_map_info(options.get("mapName", "training1"), options.get("seed"))
+    game = SimGame(info)
+    games[game.game_id] = game
+    last_game_id = game.game_id
+    while len(games) > MAX_GAMES:
+        del games[next(iter(games))]
+    return copy_info(info)
+
+
+def start_game(api_key, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.state()
+
+
+def end_game(api_key, game_id=None):
+    games.pop(game_id or last_game_id, None)
+
+
+def get_score(api_key, game_id=None):
+    game = _game(game_id)
+    if game:
+        return {
+            "gameId": game.game_id,
+            "finalPopulation": sum(x.current_pop for x in game.residences()),
+            "totalHappiness": game.total_happiness,
+            "co2": game.total_co2,
+            "finalScore": int(game.score()),
+        }
+
+
+def get_game_info(api_key, game_id=None):
+    game = _game(game_id)
+    if game:
+        return copy_info(game.info)
+
+
+def place_foundation(api_key, foundation, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("place_foundation", foundation))
+
+
+def build(api_key, pos, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("build", pos))
+
+
+def maintenance(api_key, pos, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("maintenance", pos))
+
+
+def demolish(api_key, pos, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("demolish", pos))
+
+
+def wait(api_key, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("wait"))
+
+
+def adjust_energy(api_key, energy_level, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("adjust_energy", energy_level))
+
+
+def buy_upgrades(api_key, upgrade, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.act(*sim_action("buy_upgrades", upgrade))
+
+
+def get_game_state(api_key, game_id=None):
+    game = _game(game_id)
+    if game:
+        return game.state()
+
+
+def get_games(api_key):
+    return [
+        {"gameId": x.game_id, "mapName": x.info["mapName"], "turn": x.turn}
+        for x in games.values()
+    ]
@@ -0,0 +1,175 @@
+import gzip
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+# Transports send the requests built by api.py. Swap api.transport to record
+# live games to disk or to replay a recorded game without network:
+#
+#   api.transport = RecordingTransport(api.transport)
+#   api.transport = ReplayTransport(game_id)
+
+REPLAY_DIR = "replays"
+
+
+class HttpTransport:
+    """Sends requests to the game server with one keep-alive session per
+    thread, requests.Session isn't safe to share between threads
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, url, api_key, json=None):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session.request(
+            method, url, json=json, headers={"x-api-key": api_key}
+        )
+
+
+class RecordedResponse:
+    """The parts of a requests.Response that api.py reads"""
+
+    def __init__(self, status_code, reason, text):
+        self.status_code = status_code
+        self.reason = reason
+        self.text = text
+
+    @property
+    def content(self):
+        return self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplayMismatch(Exception):
+    """The replayed game sent a different request than the recorded one"""
+
+
+def replay_path(game_id, directory=REPLAY_DIR):
+    return os.path.join(directory, game_id + ".jsonl.gz")
+
+
+def _endpoint(url):
+    """Splits a request url into the path after /api/game/ and the game id"""
+    parsed = urlparse(url)
+    game_id = parse_qs(parsed.query).get("GameId", [None])[0]
+    return parsed.path.split("/api/game/", 1)[-1], game_id
+
+
+class RecordingTransport:
+    """Forwards requests to another transport and appends every request and
+    response to a gzipped json lines log per game id. Safe to use from
+    several threads, e.g. the main one and the Prefetcher's.
+    """
+
+    MAX_OPEN = 4  # Logs kept open, the least recently opened is closed first
+
+    def __init__(self, transport, directory=REPLAY_DIR):
+        self.transport = transport
+        self.directory = directory
+        self.files = {}  # Open logs by game id, in the order they were opened
+        self.lock = threading.Lock()  # Held while writing to the logs
+        os.makedirs(directory, exist_ok=True)
+
+    def request(self, method, url, api_key, json=None):
+        response = self.transport.request(method, url, api_key, json)
+        endpoint, game_id = _endpoint(url)
+        if endpoint == "new" and response.status_code == 200:
+            game_id = response.json()["gameId"]
+        if game_id:
+            record = [
+                method,
+                endpoint,
+                json,
+                response.status_code,
+                response.reason,
+                response.text,
+            ]
+            with self.lock:
+                f = self._file(game_id)
+                f.write((_dumps(record) + "\n").encode())
+                # A sync flush keeps the log readable up to here if the game crashes
+                f.flush()
+                if endpoint == "end":
+                    self.files.pop(game_id).close()
+        return response
+
+    def _file(self, game_id):
+        f = self.files.get(game_id)
+        if f is None:
+            while len(self.files) >= self.MAX_OPEN:
+                self.files.pop(next(iter(self.files))).close()
+            f = gzip.open(replay_path(game_id, self.directory), "ab")
+            self.files[game_id] = f
+        return f
+
+    def close(self):
+        with self.lock:
+            while self.files:
+                self.files.popitem()[1].close()
+
+
+class ReplayTransport:
+    """Answers requests from a recorded game log, in the recorded order"""
+
+    def __init__(self, game_id, directory=REPLAY_DIR):
+        self.game_id = game_id
+        self.records = []
+        with gzip.open(replay_path(game_id, directory), "rt") as f:
+            try:
+                for line in f:
+                    self.records.append(json.loads(line))
+            except EOFError:  # The log of a crashed game has no gzip trailer
+                pass
+        self.position = 0
+
+    @property
+    def map_name(self):
+        """The map of the recorded game, taken from its new game request"""
+        for method, endpoint, body, *_ in self.records:
+            if endpoint == "new":
+                return body["mapName"] if body else None
+
+    def request(self, method, url, api_key, json=None):
+        endpoint, _ = _endpoint(url)
+        if self.position >= len(self.records):
+            if endpoint == "end":  # Games are often ended without being logged
+                return RecordedResponse(200, "OK", "")
+            raise ReplayMismatch(f"{method} {endpoint} after the end of the log")
+        (
+            recorded_method,
+            recorded_endpoint,
+            recorded_json,
+            status_code,
+            reason,
+            text,
+        ) = self.records[self.position]
+        if (method, endpoint, _normalize(json)) != (
+            recorded_method,
+            recorded_endpoint,
+            recorded_json,
+        ):
+            if endpoint == "end":
+                return RecordedResponse(200, "OK", "")
+            raise ReplayMismatch(
+                f"Request {self.position}: expected {recorded_method} "
+                f"{recorded_endpoint} {recorded_json}, got {method} {endpoint} {json}"
+            )
+        self.position += 1
+        return RecordedResponse(status_code, reason, text)
+
+
+def _dumps(values):
+    return json.dumps(values, separators=(",", ":"))
+
+
+def _normalize(values):
+    """Round trips a request body through json so it compares equal to a record"""
+    return json.loads(_dumps(values))
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import constants
+import main
+from game_layer import GameLayer, get_backend
+from runner import MAPS
+
+# Tunes the thresholds in constants.py by playing games with parameter sets
+# injected at runtime. Every (params, map, seed) result is cached, so repeated
+# runs and the evolution strategy only play games that haven't been played.
+#
+#   python tune.py training1 Kiruna --search es --iterations 10
+
+CACHE_PATH = "tuning.jsonl"
+
+# Name: (low, high), ints are searched as ints
+SPACE = {
+    "ENERGY_DIFF_LIMIT": (0.5, 4.0),
+    "FUNDS_MIN": (0, 10000),
+    "FUNDS_MED": (10000, 40000),
+    "HEALTH_MIN": (20, 80),
+    "QUEUE_HAPPINESS_MAX": (5, 40),
+    "UTILITY_INTERVAL": (2, 6),
+    "WINDTURBINE_RESIDENCES": (1, 10),
+}
+
+SEEDED = True  # Whether the worker's backend generates maps from the seed
+
+# Modules under this directory get the tuned values, which covers every one
+# that copied the constants with "from constants import *"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# The values in constants.py, before apply changes them
+DEFAULTS = {name: getattr(constants, name) for name in SPACE}
+
+
+def defaults():
+    return dict(DEFAULTS)
+
+
+def apply(params):
+    """Sets the constants in every loaded module of this repo that has them"""
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path or not os.path.abspath(path).startswith(ROOT + os.sep):
+            continue
+        for name, value in params.items():
+            if hasattr(module, name):
+                setattr(module, name, value)
+
+
+def init_worker(backend):
+    global SEEDED
+    SEEDED = backend == "local"
+    main.GAME_LAYER = main.configure(GameLayer(main.API_KEY, get_backend(backend)))
+    main.VERBOSE = False
+    sys.stdout = open(os.devnull, "w")
+
+
+def play(params, game_map, seed):
+    """Plays one game with params in a worker process. On the remote backend
+    the seed only numbers the repeated games.
+
+    Returns:
+        int - The final score
+    """
+    apply(params)
+    return main.main(game_map, log_score=False, seed=seed if SEEDED else None)
+
+
+class Cache:
+    """Final scores by (params, map, seed), appended to a json lines file"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.scores = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    params, game_map, seed, score = json.loads(line)
+                    self.scores[_key(params, game_map, seed)] = score
+
+    def get(self, params, game_map, seed):
+        return self.scores.get(_key(params, game_map, seed))
+
+    def add(self, params, game_map, seed, score):
+        self.scores[_key(params, game_map, seed)] = score
+        with open(self.path, "a") as f:
+            f.write(json.dumps([params, game_map, seed, score]) + "\n")
+
+
+def _key(params, game_map, seed):
+    return json.dumps(params, sort_keys=True), game_map, seed
+
+
+class Tuner:
+    def __init__(self, maps, seeds, backend="local", workers=None, cache=None):
+        self.maps = maps
+        self.seeds = seeds
+        self.cache = cache or Cache()
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=init_worker,
+            initargs=(backend,),
+        )
+
+    def evaluate(self, candidates):
+        """Plays the games of every (params, map) not in the cache in parallel
+
+        Args:
+            candidates ([(dict, str)]) - The parameter sets and their map
+
+        Returns:
+            [float] - Mean final score over the seeds of every candidate
+        """
+        games = [
+            (params, game_map, seed)
+            for params, game_map in candidates
+            for seed in self.seeds
+        ]
+        missing = [x for x in games if self.cache.get(*x) is None]
+        futures = [self.pool.submit(play, *x) for x in missing]
+        for game, future in zip(missing, futures):
+            try:
+                score = future.result()
+            except Exception as e:
+                print("Game failed: " + str(e))
+                continue
+            if score is not None:
+                self.cache.add(*game, score)
+        return [self.score(*x) for x in candidates]
+
+    def score(self, params, game_map):
+        scores = [self.cache.get(params, game_map, seed) for seed in self.seeds]
+        scores = [x for x in scores if x is not None]
+        return statistics.mean(scores) if scores else 0
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def sample(rng):
+    """A random valid parameter set from SPACE"""
+    while True:
+        params = _clip(
+            {name: rng.uniform(low, high) for name, (low, high) in SPACE.items()}
+        )
+        if _valid(params):
+            return params
+
+
+def mutate(rng, params, sigma):
+    """A valid copy of params with gaussian noise of sigma times every range"""
+    while True:
+        mutated = _clip(
+            {
+                name: value + rng.gauss(0, sigma * (SPACE[name][1] - SPACE[name][0]))
+                for name, value in params.items()
+            }
+        )
+        if _valid(mutated):
+            return mutated
+
+
+def _valid(params):
+    """FUNDS_MED is a funds threshold above the FUNDS_MIN floor"""
+    return params["FUNDS_MIN"] < params["FUNDS_MED"]
+
+
+def _clip(params):
+    clipped = {}
+    for name, value in params.items():
+        low, high = SPACE[name]
+        value = min(max(value, low), high)
+        clipped[name] = round(value) if isinstance(low, int) else round(value, 2)
+    return clipped
+
+
+def random_search(tuner, rng, iterations, population):
+    """Evaluates the defaults and iterations * population random parameter
+    sets on every map
+
+    Returns:
+        [(dict, str, float)] - Every evaluated params, map and mean score
+    """
+    params = [defaults()] + [sample(rng) for _ in range(iterations * population)]
+    candidates = [(x, game_map) for x in params for game_map in tuner.maps]
+    return [x + (y,) for x, y in zip(candidates, tuner.evaluate(candidates))]
+
+
+def evolution_strategy(tuner, rng, iterations, population, sigma=0.2):
+    """(1 + population) evolution strategy per map, starting from the
+    defaults. sigma halves after an iteration in which no offspring beats
+    its parent.
+
+    Returns:
+        [(dict, str, float)] - Every evaluated params, map and mean score
+    """
+    candidates = [(defaults(), x) for x in tuner.maps]
+    history = [x + (y,) for x, y in zip(candidates, tuner.evaluate(candidates))]
+    parents = {game_map: (params, score) for params, game_map, score in history}
+    for _ in range(iterations):
+        candidates = [
+            (mutate(rng, parents[game_map][0], sigma), game_map)
+            for game_map in tuner.maps
+            for _ in range(population)
+        ]
+        scores = tuner.evaluate(candidates)
+        improved = False
+        for (params, game_map), score in zip(candidates, scores):
+            history.append((params, game_map, score))
+            if score > parents[game_map][1]:
+                parents[game_map] = (params, score)
+                improved = True
+        if not improved:
+            sigma /= 2
+    return history
+
+
+def report(history, maps):
+    """Prints the best parameter set per map, compared to the defaults
+
+    Returns:
+        {str: (dict, float)} - Best params and mean score per map
+    """
+    best = {}
+    for game_map in maps:
+        results = [(x, score) for x, y, score in history if y == game_map]
+        params, score = max(results, key=lambda x: x[1])
+        default = next((y for x, y in results if x == defaults()), None)
+        best[game_map] = (params, score)
+        print(f"{game_map}: {score:.0f} (defaults {default:.0f})")
+        for name, value in params.items():
+            print(f"  {name} = {value}")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the constants.py thresholds")
+    parser.add_argument("maps", nargs="*", default=MAPS)
+    parser.add_argument("-s", "--search", choices=("random", "es"), default="es")
+    parser.add_argument("-i", "--iterations", type=int, default=10)
+    parser.add_argument("-p", "--population", type=int, default=8)
+    parser.add_argument("--seeds", type=int, default=3, help="games per map")
+    parser.add_argument("-b", "--backend", default="local")
+    parser.add_argument("-w", "--workers", type=int)
+    parser.add_argument("--random-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tuner = Tuner(args.maps, list(range(args.seeds)), args.backend, args.workers)
+    rng = random.Random(args.random_seed)
+    search = random_search if args.search == "random" else evolution_strategy
+    try:
+        report(search(tuner, rng, args.iterations, args.population), args.maps)
+    finally:
+        tuner.close()